@@ -1,5 +1,6 @@
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime
 
 app = Flask(__name__)
@@ -43,7 +44,7 @@ class Book(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Foreign key
-    author_id = db.Column(db.Integer, db.ForeignKey('authors.id'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('authors.id'), nullable=False, index=True)
 
     def to_dict(self):
         return {
@@ -85,7 +86,8 @@ def create_author():
 # READ all Authors
 @app.route('/api/authors', methods=['GET'])
 def get_authors():
-    authors = Author.query.all()
+    # selectinload: one extra query loads the books of ALL authors (to_dict lists them)
+    authors = Author.query.options(selectinload(Author.books)).all()
     return jsonify({
         'success': True,
         'count': len(authors),
@@ -172,7 +174,8 @@ def create_book():
 # READ all Books
 @app.route('/api/books', methods=['GET'])
 def get_books():
-    books = Book.query.all()
+    # joinedload: authors come back in the same query (to_dict reads book.author)
+    books = Book.query.options(joinedload(Book.author)).all()
     return jsonify({
         'success': True,
         'count': len(books),
@@ -1,5 +1,6 @@
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload, load_only
 from flask_cors import CORS
 from datetime import datetime
 
@@ -18,6 +19,12 @@ db = SQLAlchemy(app)
 # -----------------------------------------------------------------------------
 # MODELS
 # -----------------------------------------------------------------------------
+# to_dict(fields) only reads the fields it is asked for, so a list route can
+# load just those columns (load_only) without triggering extra queries.
+
+AUTHOR_FIELDS = ('id', 'name', 'bio', 'city')
+BOOK_FIELDS = ('id', 'title', 'year', 'isbn', 'author', 'created_at')
+
 
 class Author(db.Model):
     __tablename__ = 'authors'
@@ -29,13 +36,8 @@ class Author(db.Model):
 
     books = db.relationship('Book', backref='author', lazy=True)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'bio': self.bio,
-            'city': self.city
-        }
+    def to_dict(self, fields=AUTHOR_FIELDS):
+        return {field: getattr(self, field) for field in fields}
 
 
 class Book(db.Model):
@@ -50,33 +52,56 @@ class Book(db.Model):
     author_id = db.Column(
         db.Integer,
         db.ForeignKey('authors.id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'year': self.year,
-            'isbn': self.isbn,
-            'author': {
-                'id': self.author.id,
-                'name': self.author.name
-            },
-            'created_at': self.created_at.isoformat()
-        }
+    def to_dict(self, fields=BOOK_FIELDS):
+        data = {}
+        for field in fields:
+            if field == 'author':
+                data['author'] = {
+                    'id': self.author.id,
+                    'name': self.author.name
+                }
+            elif field == 'created_at':
+                data['created_at'] = self.created_at.isoformat()
+            else:
+                data[field] = getattr(self, field)
+        return data
+
+
+def requested_fields(allowed):
+    """?fields=id,name -> ['id', 'name'] (every field in `allowed` without ?fields=)
+
+    Raises ValueError for a field that isn't in `allowed`.
+    """
+    wanted = {field.strip() for field in request.args.get('fields', '').split(',') if field.strip()}
+    unknown = wanted - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))} (choose from {', '.join(allowed)})")
+    return [field for field in allowed if field in wanted or not wanted]
 
 # -----------------------------------------------------------------------------
 # AUTHOR CRUD ROUTES
 # -----------------------------------------------------------------------------
 
+# GET /api/authors?fields=id,name - only those columns are SELECTed (bio is a
+# long Text column that the author list doesn't show)
 @app.route('/api/authors', methods=['GET'])
 def get_authors():
-    authors = Author.query.all()
+    try:
+        fields = requested_fields(AUTHOR_FIELDS)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    # load_only: SELECT just these columns (the primary key is always added)
+    columns = [getattr(Author, field) for field in fields]
+    authors = Author.query.options(load_only(*columns)).all()
     return jsonify({
         'success': True,
         'count': len(authors),
-        'authors': [a.to_dict() for a in authors]
+        'authors': [a.to_dict(fields) for a in authors]
     })
 
 
@@ -170,13 +195,25 @@ def delete_author(id):
 # BOOK CRUD ROUTES
 # -----------------------------------------------------------------------------
 
+# GET /api/books?fields=id,title,author - only the columns those fields need
 @app.route('/api/books', methods=['GET'])
 def get_books():
-    books = Book.query.all()
+    try:
+        fields = requested_fields(BOOK_FIELDS)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    columns = [getattr(Book, field) for field in fields if field != 'author']
+    options = [load_only(Book.id, *columns)]
+    if 'author' in fields:
+        # joinedload: authors come back in the same query (to_dict reads book.author),
+        # with only the two author columns the JSON shows
+        options.append(joinedload(Book.author).load_only(Author.id, Author.name))
+    books = Book.query.options(*options).all()
     return jsonify({
         'success': True,
         'count': len(books),
-        'books': [b.to_dict() for b in books]
+        'books': [b.to_dict(fields) for b in books]
     })
 
 
@@ -1,5 +1,6 @@
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 # ======================
@@ -28,7 +29,7 @@ class Book(db.Model):
     year = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False, index=True)
 
     def to_dict(self):
         return {
@@ -44,7 +45,8 @@ class Book(db.Model):
 
 @app.route('/api/books', methods=['GET'])
 def get_books():
-    books = Book.query.all()
+    # joinedload: authors come back in the same query (to_dict reads book.author)
+    books = Book.query.options(joinedload(Book.author)).all()
     return jsonify({
         'success': True,
         'count': len(books),
@@ -62,7 +64,7 @@ def get_books_with_pagination():
     per_page = request.args.get('per_page', 5, type=int)
 
     # Paginate query
-    pagination = Book.query.paginate(
+    pagination = Book.query.options(joinedload(Book.author)).paginate(
         page=page,
         per_page=per_page,
         error_out=False
@@ -1,5 +1,6 @@
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 # ======================
@@ -23,12 +24,19 @@ class Author(db.Model):
 
 
 class Book(db.Model):
+    # One index per sort option of /api/books-with-sorting, so ORDER BY reads rows in index order
+    __table_args__ = (
+        db.Index('ix_book_title_id', 'title', 'id'),
+        db.Index('ix_book_year_id', 'year', 'id'),
+        db.Index('ix_book_created_at_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     year = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False, index=True)
 
     def to_dict(self):
         return {
@@ -110,11 +118,14 @@ def get_books_with_sorting():
     # Default sort column
     sort_column = sort_columns.get(sort, Book.id)
 
+    # Load each book's author in the same query (to_dict reads book.author)
+    query = Book.query.options(joinedload(Book.author))
+
     # Order handling
     if order == 'desc':
-        query = Book.query.order_by(sort_column.desc())
+        query = query.order_by(sort_column.desc(), Book.id.desc())  # id: stable order, matches the index
     else:
-        query = Book.query.order_by(sort_column.asc())
+        query = query.order_by(sort_column.asc(), Book.id.asc())
 
     books = query.all()
 
@@ -1,9 +1,14 @@
 import os
-import time
-from flask import Flask, jsonify
+import sys
+
+import click
+from flask import Flask, g, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))  # Repository root, for dbtools/
+from dbtools import bulk_load, timing  # noqa: E402
+
 # Load environment variables
 load_dotenv()
 
@@ -12,14 +17,60 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
     'DATABASE_URL', 'sqlite:///performance.db'
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '100'))  # Statements slower than this go to the slow-query log
+app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG')  # Slow-query log file (None = print to the console)
+app.config['EXPOSE_QUERY_STATS'] = os.getenv('EXPOSE_QUERY_STATS') == '1'  # GET /debug/queries outside debug mode (shows raw SQL)
 
 db = SQLAlchemy(app)
 
+# =============================================================================
+# QUERY TIMING
+# =============================================================================
+# Every statement is timed by dbtools/timing.py: GET /debug/queries, the
+# slow-query log (SLOW_QUERY_MS) and a Server-Timing header on every response.
+with app.app_context():
+    timing.init_app(app, [db.engine])
+
+
 # MODEL
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200))
-    price = db.Column(db.Float)
+    price = db.Column(db.Float, index=True)  # /test filters on price
+
+
+# =============================================================================
+# BULK LOADER (flask load / flask seed)
+# =============================================================================
+# Creating one ORM object per row is slow and keeps every object in memory.
+# dbtools/bulk_load.py streams the rows in batches instead (COPY on PostgreSQL,
+# executemany elsewhere), all in one transaction.
+#
+#   flask --app app load products.csv --batch-size 5000
+#   flask --app app seed --rows 100000
+
+LOADABLE_MODELS = {'product': Product}
+
+
+@app.cli.command('load')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--model', type=click.Choice(list(LOADABLE_MODELS)), default='product', show_default=True)
+@click.option('--batch-size', default=5000, show_default=True, help='Rows sent per executemany/COPY')
+def load_command(path, model, batch_size):
+    """Bulk-load rows from a CSV or NDJSON file"""
+    table = LOADABLE_MODELS[model].__table__
+    db.create_all()
+    bulk_load.load_and_report(db.engine, table, bulk_load.read_rows(path), batch_size)
+
+
+@app.cli.command('seed')
+@click.option('--rows', default=10000, show_default=True)
+@click.option('--batch-size', default=5000, show_default=True)
+def seed_command(rows, batch_size):
+    """Insert generated sample products (for trying things at scale)"""
+    db.create_all()
+    products = ({'name': f'Product {i}', 'price': i * 10} for i in range(rows))
+    bulk_load.load_and_report(db.engine, Product.__table__, products, batch_size)
 
 
 # INIT DB
@@ -29,28 +80,21 @@ def init_db():
         db.create_all()
 
         if Product.query.count() == 0:
-            products = [
-                Product(name=f'Product {i}', price=i * 10)
-                for i in range(1, 10001)
-            ]
-            db.session.bulk_save_objects(products)
-            db.session.commit()
+            products = ({'name': f'Product {i}', 'price': i * 10} for i in range(1, 10001))
+            bulk_load.load_rows(db.engine, Product.__table__, products)  # Batched executemany instead of 10,000 ORM objects
 
 
 # PERFORMANCE TEST
 
 @app.route('/test')
 def test_performance():
-    start = time.time()
-
     products = Product.query.filter(Product.price > 500).all()
 
-    end = time.time()
-    duration = end - start
-
+    # Measured by the QUERY TIMING hooks: includes fetching the rows, not building the objects
     return jsonify({
         "records_fetched": len(products),
-        "execution_time_seconds": duration
+        "execution_time_seconds": g.get('db_ms', 0.0) / 1000,
+        "statements": g.get('db_statements', 0)
     })
 
 if __name__ == '__main__':
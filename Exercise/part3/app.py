@@ -9,6 +9,8 @@
 
 from flask import Flask, render_template, request, redirect, url_for, flash
 from flask_sqlalchemy import SQLAlchemy  # Import SQLAlchemy
+from sqlalchemy import func, select
+from sqlalchemy.orm import contains_eager, joinedload
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key'
@@ -38,7 +40,7 @@ class Student(db.Model):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False) 
     
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
 
     def __repr__(self):
         return f'<Student {self.name}>'
@@ -48,7 +50,7 @@ class Teacher(db.Model):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
 
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
 
     def __repr__(self):
         return f'<Teacher {self.name}>'
@@ -57,13 +59,18 @@ class Teacher(db.Model):
 
 @app.route('/')
 def index():
-    students = Student.query.all()  
+    students = Student.query.options(joinedload(Student.course)).all()  # Course in the same query (no N+1)
     return render_template('index.html', students=students)
 
 
 @app.route('/courses')
 def courses():
-    all_courses = Course.query.all()  
+    student_count = (
+        select(func.count(Student.id))
+        .where(Student.course_id == Course.id)
+        .scalar_subquery()
+    )
+    all_courses = db.session.query(Course, student_count.label('student_count')).all()  # Count in SQL
     return render_template('courses.html', courses=all_courses)
 
 
@@ -129,7 +136,7 @@ def add_course():
 
 @app.route('/teachers')
 def teachers():
-    teachers = Teacher.query.all()
+    teachers = Teacher.query.options(joinedload(Teacher.course)).all()
     return render_template('teachers.html', teachers=teachers)
 
 
@@ -179,35 +186,35 @@ def delete_teacher(id):
 
 @app.route('/students/sort/name')
 def students_sort_name():
-    students = Student.query.order_by(Student.name.asc()).all()
+    students = Student.query.options(joinedload(Student.course)).order_by(Student.name.asc()).all()
     return render_template('index.html', students=students)
 
 @app.route('/students/latest')
 def latest_students():
-    students = Student.query.order_by(Student.id.desc()).limit(5).all()
+    students = Student.query.join(Student.course).options(contains_eager(Student.course)).order_by(Student.id.desc()).limit(5).all()  # A JOIN: joinedload + LIMIT would wrap the query in a subquery
     return render_template('index.html', students=students)
 
 @app.route('/students/course/<course_name>')
 def students_by_course(course_name):
-    students = Student.query.filter(
-        Student.course.has(name=course_name)
+    students = Student.query.join(Student.course).options(contains_eager(Student.course)).filter(
+        Course.name == course_name  # JOIN uses the course_id index (has() ran a subquery per student)
     ).all()
     return render_template('index.html', students=students)
 
 @app.route('/teachers/sort/name')
 def teachers_sort_name():
-    teachers = Teacher.query.order_by(Teacher.name.asc()).all()
+    teachers = Teacher.query.options(joinedload(Teacher.course)).order_by(Teacher.name.asc()).all()
     return render_template('teachers.html', teachers=teachers)
 
 @app.route('/teachers/latest')
 def latest_teachers():
-    teachers = Teacher.query.order_by(Teacher.id.desc()).limit(3).all()
+    teachers = Teacher.query.join(Teacher.course).options(contains_eager(Teacher.course)).order_by(Teacher.id.desc()).limit(3).all()
     return render_template('teachers.html', teachers=teachers)
 
 @app.route('/teachers/course/<course_name>')
 def teachers_by_course(course_name):
-    teachers = Teacher.query.filter(
-        Teacher.course.has(name=course_name)
+    teachers = Teacher.query.join(Teacher.course).options(contains_eager(Teacher.course)).filter(
+        Course.name == course_name
     ).all()
     return render_template('teachers.html', teachers=teachers)
 
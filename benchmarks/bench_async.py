@@ -0,0 +1,225 @@
+"""
+Benchmark: threads (part-4/app.py) vs event loop (part-4/async_app.py)
+=======================================================================
+Starts each API as a real server on the same seeded database and hits it
+with many concurrent keep-alive connections:
+- sync:  app.py on Werkzeug's threaded server (one thread per connection)
+- async: async_app.py on uvicorn (one event loop)
+
+Reports requests/sec, p50/p95/p99 latency and errors per concurrency level,
+plus the server's peak RSS and highest thread count (Linux), as JSON.
+
+The test client used by the other benchmarks calls the app directly, which
+hides exactly what this benchmark is about, so this one goes over real
+sockets with a tiny asyncio HTTP client.
+
+app.py's response cache is turned off (CACHE_BACKEND=none) so both servers
+do the same database work. Expect the event loop to win only when requests
+spend their time waiting: try a PostgreSQL server over the network with
+--database-url. With local SQLite the queries are quick CPU work (and
+aiosqlite runs them on a helper thread anyway), so threads often keep up.
+
+Needs: pip install quart "sqlalchemy[asyncio]" aiosqlite uvicorn (asyncpg for PostgreSQL)
+
+Run from the repository root:
+    python benchmarks/bench_async.py --concurrency 10,100,500 --requests 5000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import init_db, load_app, percentile
+
+PATHS = ('/api/books/{id}', '/api/books?limit=20')  # Alternated: a lookup and a page
+
+
+# =============================================================================
+# SERVERS (each runs in its own process: python bench_async.py --serve sync)
+# =============================================================================
+
+def serve(kind, port, rows):
+    app_module = load_app('part-4')  # Same DATABASE_URL for both: seed it through the sync app
+    init_db(app_module)
+    with app_module.app.app_context():
+        if app_module.Book.query.count() < rows:
+            rng = random.Random(42)
+            app_module.bulk_load.load_rows(app_module.db.engine, app_module.Book.__table__, (
+                {'title': f'Book {i}', 'author': f'Author {rng.randint(1, 500)}', 'year': rng.randint(1950, 2024)}
+                for i in range(rows)
+            ))
+
+    if kind == 'sync':
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No access log line per request
+        make_server('127.0.0.1', port, app_module.app, threaded=True).serve_forever()
+    else:
+        import uvicorn
+        async_module = load_app('part-4', module='async_app')
+        uvicorn.run(async_module.app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def read_status(pid):
+    """Current thread count and peak RSS (MB) of a process, from /proc (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None, None
+    return int(status['Threads']), round(int(status['VmHWM'].split()[0]) / 1024, 1)
+
+
+class ServerWatcher(threading.Thread):
+    """Samples the server's thread count while the load runs (threads vanish afterwards)"""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.max_threads = None
+        self.running = True
+
+    def run(self):
+        while self.running:
+            threads, _ = read_status(self.pid)
+            if threads is not None:
+                self.max_threads = max(self.max_threads or 0, threads)
+            time.sleep(0.05)
+
+    def stop(self):
+        self.running = False
+        self.join()
+        return {'server_peak_rss_mb': read_status(self.pid)[1], 'server_max_threads': self.max_threads}
+
+
+# =============================================================================
+# LOAD GENERATOR (asyncio, keep-alive HTTP/1.1)
+# =============================================================================
+
+async def http_get(reader, writer, path):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('server closed the connection')
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode().partition(':')
+        headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    return int(status_line.split()[1]), headers.get('connection', '').lower() == 'close'
+
+
+async def client(port, requests, rows, rng, latencies, errors):
+    reader = writer = None
+    for n in range(requests):
+        path = PATHS[n % len(PATHS)].format(id=rng.randint(1, rows))
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            status, closed = await http_get(reader, writer, path)
+            if status >= 400:
+                errors.append(status)
+            if closed:  # The server does not keep this connection open: reconnect next time
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            writer = None
+        latencies.append(time.perf_counter() - start)
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, requests, concurrency, rows, seed):
+    latencies, errors = [], []
+    per_client = max(1, requests // concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(client(port, per_client, rows, random.Random(seed + n), latencies, errors)
+                           for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', default='10,100,500', help='open connections, e.g. 10,100,500')
+    parser.add_argument('--requests', type=int, default=5000, help='per concurrency level')
+    parser.add_argument('--rows', type=int, default=10000, help='books in the database')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--servers', default='sync,async')
+    parser.add_argument('--database-url', help='shared by both apps, e.g. postgresql://user:pw@host/db')
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.rows)
+        return
+
+    env = dict(os.environ, CACHE_BACKEND='none', SLOW_QUERY_MS='1000')
+    # One database file for both servers (load_app gives each process its own folder)
+    env['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    results = []
+    for kind in args.servers.split(','):
+        port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', kind,
+                                   '--port', str(port), '--rows', str(args.rows)], env=env)
+        try:
+            wait_until_up(port, server)
+            asyncio.run(drive(port, 100, 10, args.rows, args.seed))  # Warm up: connections, caches
+            for concurrency in map(int, args.concurrency.split(',')):
+                watcher = ServerWatcher(server.pid)
+                watcher.start()
+                result = {'server': kind, **asyncio.run(drive(port, args.requests, concurrency, args.rows, args.seed))}
+                result.update(watcher.stop())
+                print(f'  {kind:<5} c={concurrency:<4} {result["requests_per_sec"]:>8} req/s  '
+                      f'p50 {result["p50_ms"]} ms  p99 {result["p99_ms"]} ms  errors {result["errors"]}',
+                      file=sys.stderr)
+                results.append(result)
+        finally:
+            server.terminate()
+            server.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: SQLite connection reuse in part-1 and part-2
+========================================================
+Compares requests/sec on `/` and `/add` with the connection pool turned
+off (DB_POOL_SIZE = 0, a new sqlite3.connect() per request - the old
+behaviour) and turned on.
+
+Run from the repository root:
+    python benchmarks/bench_connection_reuse.py --requests 2000 --concurrency 4
+"""
+
+import argparse
+
+from common import init_db, load_app, report, run_load
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=500, help='students in the table before reading')
+    args = parser.parse_args()
+
+    results = []
+    for part in ('part-1', 'part-2'):
+        mod = load_app(part)
+        init_db(mod)
+        with mod.app.app_context():
+            conn = mod.connect_db()
+            conn.executemany(
+                'INSERT INTO students (name, email, course) VALUES (?, ?, ?)',
+                [(f'Student {i}', f's{i}@example.com', 'Python') for i in range(args.rows)]
+            )
+            conn.commit()
+            conn.close()
+
+        add = ('GET', '/add', {}) if part == 'part-1' else \
+              ('POST', '/add', {'data': {'name': 'Bench', 'email': 'b@example.com', 'course': 'SQL'}})
+
+        pooled = mod.app.config['DB_POOL_SIZE']
+        for method, path, kwargs in (('GET', '/', {}), add):  # Reads first, so both runs see the same rows
+            for pool_size in (0, pooled):
+                mod.app.config['DB_POOL_SIZE'] = pool_size
+                mod.app.extensions['db_pool'].close_all()
+                result = run_load(mod.app, method, path, args.requests, args.concurrency, **kwargs)
+                result.update(part=part, pool_size=pool_size)
+                results.append(result)
+        mod.app.config['DB_POOL_SIZE'] = pooled
+
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: JSON providers and response compression for part-4's book list
+=========================================================================
+For every dataset size, GET /api/books?limit=<rows> (one page holding every
+book, response cache off) is sent with each JSON provider and each
+Accept-Encoding. Reported per combination (medians over --repeat calls):
+- encode_ms:  app.json.response() for that page alone (no query, no compression)
+- request_ms: the whole get_books() call: query, JSON and compression
+- bytes:      the body as sent (bytes on the wire)
+
+Missing optional libraries are skipped: orjson (pip install orjson),
+br (pip install brotli), zstd (pip install zstandard).
+
+Run from the repository root:
+    python benchmarks/bench_json.py --rows 1k,10k,100k
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from bench_suite import comma_list, parse_size
+from common import init_db, load_app, report
+
+PROVIDERS = ('stdlib', 'orjson')
+ENCODINGS = ('identity', 'gzip', 'br', 'zstd')
+
+
+def seed(mod, rows):
+    with mod.app.app_context():
+        mod.db.session.execute(mod.Book.__table__.delete())
+        mod.db.session.commit()
+        mod.bulk_load.load_rows(mod.db.engine, mod.Book.__table__, (
+            {'title': f'Book {i}', 'author': f'Author {i % 500}', 'year': 1950 + i % 70, 'isbn': f'isbn-{i}'}
+            for i in range(rows)
+        ))
+
+
+def median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2), result
+
+
+def encode_ms(app, mod, rows, repeat):
+    with app.test_request_context():
+        page = {'success': True, 'books': [mod.book_serializer.dump(book) for book in mod.Book.query.limit(rows)]}
+        return median_ms(lambda: app.json.response(page).get_data(), repeat)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=comma_list(parse_size), default=[1000, 10000, 100000], help='e.g. 1k,10k,100k')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    mod = load_app('part-4')
+    init_db(mod)
+    results = []
+    for rows in args.rows:
+        seed(mod, rows)
+        for provider in PROVIDERS:
+            try:
+                app = mod.create_app({'JSON_PROVIDER': provider, 'CACHE_BACKEND': 'none', 'MAX_PAGE_SIZE': rows,
+                                      'SLOW_QUERY_MS': float('inf')})
+            except ImportError:
+                print(f'  {provider}: not installed, skipped', file=sys.stderr)
+                continue
+            client = app.test_client()
+            encode = encode_ms(app, mod, rows, args.repeat)
+            for encoding in ENCODINGS:
+                if encoding != 'identity' and encoding not in app.extensions['encodings']:
+                    continue
+                request_ms, body = median_ms(lambda: client.get(f'/api/books?limit={rows}', headers={
+                    'Accept-Encoding': encoding}).get_data(), args.repeat)
+                results.append({'rows': rows, 'provider': provider, 'encoding': encoding, 'encode_ms': encode,
+                                'request_ms': request_ms, 'bytes': len(body)})
+                print(f'  rows={rows:<7} {provider:<7} {encoding:<9} encode {encode:>8} ms  '
+                      f'request {request_ms:>8} ms  {len(body):>10} bytes', file=sys.stderr)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: full-text search vs ILIKE on /api/books/search (part-4)
+===================================================================
+Seeds N books with random titles, then times the same searches through the
+'like' backend (leading-wildcard ILIKE, full table scan) and the full-text
+backend picked for the database (SQLite FTS5 here).
+
+Run from the repository root:
+    python benchmarks/bench_search.py --rows 100000 1000000
+"""
+
+import argparse
+import random
+import time
+
+from common import init_db, load_app, percentile, report
+
+COMMON = ('python flask web data science machine learning guide cookbook deep dive '
+          'practical modern clean code design patterns database systems network').split()
+SYLLABLES = 'ka lo mi ne ru sa te vo zi ba do fu ge hi ja'.split()
+# A few thousand made-up words, so most searches match a small slice of books (like real titles)
+RARE = sorted({a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES})
+QUERIES = ['python', 'flask web', 'clean code', 'kalomi', 'zibado', 'rusa', 'machine learning guide']
+
+
+def random_title(rng):
+    return ' '.join([rng.choice(COMMON), rng.choice(RARE), rng.choice(RARE), rng.choice(COMMON)]).title()
+
+
+def seed(mod, rows, batch=50000):
+    rng = random.Random(42)
+    with mod.app.app_context():
+        table = mod.Book.__table__
+        for start in range(0, rows, batch):
+            mod.db.session.execute(table.insert(), [
+                {'title': random_title(rng),
+                 'author': f'Author {rng.randrange(5000)}', 'year': rng.randrange(1950, 2025)}
+                for _ in range(start, min(rows, start + batch))
+            ])
+        mod.db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000])
+    parser.add_argument('--repeat', type=int, default=20, help='times each query is sent')
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        mod = load_app('part-4')
+        init_db(mod)  # Creates the FTS index; the triggers index the seeded rows
+        seed(mod, rows)
+        fts_backend = mod.app.extensions['search_backend']  # What init_db() just set up
+        client = mod.app.test_client()
+
+        for backend in ('like', fts_backend):
+            mod.app.extensions['search_backend'] = backend
+            latencies = []
+            for _ in range(args.repeat):
+                for q in QUERIES:
+                    start = time.perf_counter()
+                    client.get('/api/books/search', query_string={'q': q, 'limit': 20}).close()
+                    latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            results.append({
+                'rows': rows,
+                'backend': backend,
+                'searches': len(latencies),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            })
+
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: part-4 serializers against ORM objects + to_dict()
+=============================================================
+Builds the list of book dicts for <rows> books (what paginate() hands to
+jsonify) in three ways:
+- orm:      Book.query -> full ORM objects -> a dict per book, one attribute
+            at a time (what paginate() did before book_serializer)
+- records:  book_serializer: only the columns, Row tuples -> slotted records -> dicts
+- sparse:   the same with ?fields=id,title
+Reported per way:
+- cpu_ms:  CPU time (time.process_time), median over --repeat runs
+- wall_ms: elapsed time, median over --repeat runs
+- peak_mb: highest Python memory while building the list (tracemalloc)
+- held_mb: memory still in use once the list is built (the list, plus the ORM
+           objects the session keeps in its identity map until it ends)
+
+Run from the repository root:
+    python benchmarks/bench_serializers.py --rows 10k,100k
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+
+from bench_json import seed
+from bench_suite import comma_list, parse_size
+from common import init_db, load_app, report
+
+
+def orm_dicts(mod, rows):
+    return [{'id': book.id, 'title': book.title, 'author': book.author, 'year': book.year, 'isbn': book.isbn,
+             'created_at': book.created_at.isoformat() if book.created_at else None}
+            for book in mod.Book.query.order_by(mod.Book.id).limit(rows)]
+
+
+def serializer_dicts(fields):
+    def build(mod, rows):
+        record_type = mod.book_serializer.record_type(mod.book_serializer.fieldset(fields))
+        query = mod.select(*record_type.columns).order_by(mod.Book.id).limit(rows)
+        return [record_type.dump(row) for row in mod.db.session.execute(query)]
+    return build
+
+
+WAYS = {
+    'orm': orm_dicts,
+    'records': serializer_dicts(None),
+    'sparse': serializer_dicts('id,title'),
+}
+
+
+def measure(mod, build, rows, repeat):
+    cpu, wall = [], []
+    for _ in range(repeat):
+        with mod.app.app_context():  # New session (empty identity map) for every run
+            started_cpu, started = time.process_time(), time.perf_counter()
+            build(mod, rows)
+            cpu.append(time.process_time() - started_cpu)
+            wall.append(time.perf_counter() - started)
+
+    with mod.app.app_context():
+        tracemalloc.start()
+        books = build(mod, rows)
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del books
+    return {
+        'cpu_ms': round(statistics.median(cpu) * 1000, 1),
+        'wall_ms': round(statistics.median(wall) * 1000, 1),
+        'peak_mb': round(peak / 1024 / 1024, 2),
+        'held_mb': round(held / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=comma_list(parse_size), default=[10000, 100000], help='e.g. 1k,10k,100k')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    mod = load_app('part-4')
+    init_db(mod)
+    results = []
+    for rows in args.rows:
+        seed(mod, rows)
+        for way, build in WAYS.items():
+            stats = measure(mod, build, rows, args.repeat)
+            results.append({'rows': rows, 'way': way, **stats})
+            print(f'  rows={rows:<7} {way:<8} cpu {stats["cpu_ms"]:>8} ms  wall {stats["wall_ms"]:>8} ms  '
+                  f'peak {stats["peak_mb"]:>8} MB  held {stats["held_mb"]:>8} MB', file=sys.stderr)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
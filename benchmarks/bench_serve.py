@@ -0,0 +1,129 @@
+"""
+Benchmark: part-4 API with 1, 2, 4, ... gunicorn workers
+========================================================
+Starts `flask --app app serve` (part-4) with more and more worker processes
+on the same seeded database and measures requests/sec over real sockets.
+One worker per CPU core should scale close to linearly until the cores run
+out: `efficiency` is the speedup divided by the worker ratio (1.0 = linear).
+
+The load comes from several client processes (--client-processes), each an
+asyncio keep-alive client from bench_async.py, so the load generator does
+not become the bottleneck first. Clients and server share the machine:
+leave cores free for the clients (e.g. test 1..4 workers on 8 cores).
+
+app.py's response cache is turned off (CACHE_BACKEND=none) so every request
+does its database work.
+
+Needs: pip install gunicorn (Linux/macOS)
+
+Run from the repository root:
+    python benchmarks/bench_serve.py --workers 1,2,4 --concurrency 64 --requests 20000
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+from bench_async import ServerWatcher, client, free_port, wait_until_up
+from common import init_db, load_app, percentile
+
+
+def comma_list(text):
+    return [int(item) for item in text.split(',') if item]
+
+
+def seed_database(rows):
+    """Seed a throwaway copy of part-4 and return its folder (the servers run from there)"""
+    mod = load_app('part-4')
+    init_db(mod)
+    with mod.app.app_context():
+        rng = random.Random(42)
+        mod.bulk_load.load_rows(mod.db.engine, mod.Book.__table__, (
+            {'title': f'Book {i}', 'author': f'Author {rng.randint(1, 500)}', 'year': rng.randint(1950, 2024)}
+            for i in range(rows)
+        ))
+    return os.getcwd()
+
+
+def client_process(port, requests, concurrency, rows, seed):
+    """One load generator process: `concurrency` keep-alive connections, `requests` calls in total"""
+    async def run():
+        latencies, errors = [], []
+        started = time.time()
+        await asyncio.gather(*(client(port, max(1, requests // concurrency), rows, random.Random(seed + n),
+                                      latencies, errors) for n in range(concurrency)))
+        return latencies, len(errors), started, time.time()
+    return asyncio.run(run())
+
+
+def measure(port, args, pool):
+    """Split the load over the client processes and merge what they measured"""
+    per_process = max(1, args.concurrency // args.client_processes)
+    jobs = [(port, args.requests // args.client_processes, per_process, args.rows, args.seed + 1000 * n)
+            for n in range(args.client_processes)]
+    latencies, errors, starts, ends = [], 0, [], []
+    for mine, failed, started, finished in pool.starmap(client_process, jobs):
+        latencies.extend(mine)
+        errors += failed
+        starts.append(started)
+        ends.append(finished)
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_sec': round(len(latencies) / (max(ends) - min(starts)), 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=comma_list, default=[1, 2, 4], help='gunicorn workers, e.g. 1,2,4,8')
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker')
+    parser.add_argument('--concurrency', type=int, default=64, help='open connections in total')
+    parser.add_argument('--requests', type=int, default=20000, help='per worker count')
+    parser.add_argument('--client-processes', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--rows', type=int, default=10000, help='books in the database')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = seed_database(args.rows)
+    env = dict(os.environ, CACHE_BACKEND='none', SLOW_QUERY_MS='1000')
+    results = []
+    with multiprocessing.Pool(args.client_processes) as pool:
+        for workers in args.workers:
+            port = free_port()
+            server = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'serve', '--port', str(port),
+                                       '--workers', str(workers), '--threads', str(args.threads)],
+                                      cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_up(port, server)
+                time.sleep(1)  # Let every worker finish booting
+                measure(port, argparse.Namespace(**{**vars(args), 'requests': 500}), pool)  # Warm up
+                watcher = ServerWatcher(server.pid)
+                watcher.start()
+                result = {'workers': workers, 'threads': args.threads, **measure(port, args, pool)}
+                result['master_peak_rss_mb'] = watcher.stop()['server_peak_rss_mb']
+            finally:
+                server.terminate()  # SIGTERM: gunicorn finishes in-flight requests, then exits
+                server.wait()
+            base = results[0] if results else result
+            speedup = result['requests_per_sec'] / base['requests_per_sec']
+            result['speedup'] = round(speedup, 2)
+            result['efficiency'] = round(speedup / (workers / base['workers']), 2)
+            print(f'  workers={workers:<3} {result["requests_per_sec"]:>9} req/s  speedup {result["speedup"]}x  '
+                  f'efficiency {result["efficiency"]}  p99 {result["p99_ms"]} ms  errors {result["errors"]}',
+                  file=sys.stderr)
+            results.append(result)
+    print(json.dumps({'cpu_count': os.cpu_count(), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
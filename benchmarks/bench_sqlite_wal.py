@@ -0,0 +1,106 @@
+"""
+Benchmark: readers vs writers with and without the SQLite performance profile
+==============================================================================
+Measures reader throughput on its own, then again while writer threads keep
+inserting rows. With SQLite's default rollback journal every write locks
+readers out; with SQLITE_PRAGMAS (WAL + friends) they keep going.
+
+Everything runs in one Python process, so readers and writers also share
+the GIL - compare reader AND writer throughput together.
+
+Covers part-2 (raw sqlite3) and part-4 (SQLAlchemy).
+
+Run from the repository root:
+    python benchmarks/bench_sqlite_wal.py --requests 1000 --readers 4 --writers 2
+"""
+
+import argparse
+import threading
+import time
+
+from common import init_db, load_app, report, run_load
+
+ROUTES = {
+    # part: (read path, write path, write kwargs) - single-row reads, so growing tables don't skew results
+    'part-2': ('/edit/1', '/add', {'data': {'name': 'Writer', 'email': 'w@example.com', 'course': 'SQL'}}),
+    'part-4': ('/api/books/1', '/api/books', {'json': {'title': 'Write Heavy', 'author': 'Bench'}}),
+}
+
+
+def seed(mod, part, rows):
+    if part == 'part-2':
+        init_db(mod)
+        with mod.app.app_context():
+            conn = mod.connect_db()
+            conn.executemany(
+                'INSERT INTO students (name, email, course) VALUES (?, ?, ?)',
+                [(f'Student {i}', f's{i}@example.com', 'Python') for i in range(rows)]
+            )
+            conn.commit()
+            conn.close()
+    else:
+        init_db(mod)
+        with mod.app.app_context():
+            mod.db.session.execute(
+                mod.Book.__table__.insert(),
+                [{'title': f'Book {i}', 'author': f'Author {i % 50}', 'year': 2000 + i % 25} for i in range(rows)]
+            )
+            mod.db.session.commit()
+
+
+def start_writers(app, path, kwargs, count, stop, counter):
+    def writer():
+        client = app.test_client()
+        while not stop.is_set():
+            client.post(path, **kwargs).close()
+            with counter['lock']:
+                counter['writes'] += 1
+
+    threads = [threading.Thread(target=writer) for _ in range(count)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=200)
+    args = parser.parse_args()
+
+    results = []
+    for part, (read_path, write_path, write_kwargs) in ROUTES.items():
+        for profile in ('default', 'performance'):
+            mod = load_app(part)  # Fresh copy: WAL mode is stored in the database file
+            if profile == 'default':
+                mod.app.config['SQLITE_PRAGMAS'] = {}
+            seed(mod, part, args.rows)
+
+            alone = run_load(mod.app, 'GET', read_path, args.requests, args.readers)
+
+            stop = threading.Event()
+            counter = {'writes': 0, 'lock': threading.Lock()}
+            writers = start_writers(mod.app, write_path, write_kwargs, args.writers, stop, counter)
+            started = time.perf_counter()
+            mixed = run_load(mod.app, 'GET', read_path, args.requests, args.readers)
+            elapsed = time.perf_counter() - started
+            stop.set()
+            for t in writers:
+                t.join()
+
+            results.append({
+                'part': part,
+                'profile': profile,
+                'readers_alone_rps': alone['requests_per_sec'],
+                'readers_with_writers_rps': mixed['requests_per_sec'],
+                'reader_p99_with_writers_ms': mixed['p99_ms'],
+                'writes_per_sec': round(counter['writes'] / elapsed, 1),
+            })
+
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
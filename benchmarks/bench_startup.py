@@ -0,0 +1,121 @@
+"""
+Benchmark: cold start of parts 1-5
+==================================
+A new worker (an autoscaler adding capacity, gunicorn replacing a worker,
+a serverless instance) pays for startup before it answers anything. This
+starts a fresh Python process per run and measures, per part:
+- import_ms:        `import app` (Flask, SQLAlchemy, ... and the module itself)
+- create_app_ms:    create_app() (config, engines, listeners, blueprint)
+- first_request_ms: the first GET / (first connection, first query)
+- process_ms:       the whole process, interpreter start to first response
+
+The tables are created once beforehand with `flask --app app init-db`, so
+no run pays for schema creation. Numbers are medians over --repeat runs.
+
+--top lists the imports that cost the most (python -X importtime), to see
+what is worth loading lazily.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py --repeat 10 --top 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import copy_part
+
+PARTS = ('part-1', 'part-2', 'part-3', 'part-4', 'part-5')
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+status = flask_app.test_client().get('/').status_code
+answered = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (answered - created) * 1000,
+    'status': status,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def child_env():
+    """Quiet, and the same settings for every run (no .env or METRICS_DIR from the caller)"""
+    env = dict(os.environ, SLOW_QUERY_MS='100000', PYTHONDONTWRITEBYTECODE='1')
+    for name in ('DATABASE_URL', 'DATABASE_REPLICA_URLS', 'METRICS_DIR', 'SLOW_QUERY_LOG'):
+        env.pop(name, None)
+    return env
+
+
+def run_once(workdir):
+    started = time.perf_counter()
+    child = subprocess.run([sys.executable, '-c', CHILD], cwd=workdir, env=child_env(),
+                           stdout=subprocess.PIPE, text=True, check=True)
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def slowest_imports(workdir, top):
+    """The modules app.py imports itself, by cumulative time (python -X importtime)
+
+    importtime prints a module after everything it imported, those indented
+    one level deeper: the lines one level deep right before "app" are its imports.
+    """
+    child = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=workdir,
+                           env=child_env(), stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True, check=True)
+    direct = []
+    for line in child.stderr.splitlines():  # "import time:  self [us] | cumulative | imported package"
+        parts = line.split('|')
+        if not line.startswith('import time:') or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        name = parts[2].strip()
+        if depth == 1:
+            direct.append((int(parts[1]) / 1000, name))
+        elif depth == 0:
+            if name == 'app':
+                break
+            direct = []  # Imported while Python started (site, encodings, ...), not by app.py
+    return [{'module': name, 'ms': round(ms, 1)} for ms, name in sorted(direct, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--parts', default=','.join(PARTS), help='e.g. part-1,part-5')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh processes per part')
+    parser.add_argument('--top', type=int, default=0, help='also list the N slowest imports of each part')
+    args = parser.parse_args()
+
+    results = []
+    for part in args.parts.split(','):
+        workdir = copy_part(part)
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=workdir, env=child_env(),
+                       stdout=subprocess.DEVNULL, check=True)
+        run_once(workdir)  # Warm the OS file cache, so the first timed run isn't the odd one out
+        runs = [run_once(workdir) for _ in range(args.repeat)]
+        result = {'part': part, 'runs': len(runs), 'status': runs[-1]['status'], 'modules': runs[-1]['modules']}
+        for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'process_ms'):
+            result[key] = round(statistics.median(run[key] for run in runs), 1)
+        if args.top:
+            result['slowest_imports'] = slowest_imports(workdir, args.top)
+        print(f'  {part:<7} import {result["import_ms"]:>6} ms  create_app {result["create_app_ms"]:>6} ms  '
+              f'first request {result["first_request_ms"]:>6} ms  process {result["process_ms"]:>7} ms',
+              file=sys.stderr)
+        results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
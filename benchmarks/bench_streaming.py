@@ -0,0 +1,78 @@
+"""
+Benchmark: peak memory of streamed vs buffered book listings (part-4)
+======================================================================
+"buffered" is the old get_books(): Book.query.all() -> list of dicts ->
+one big jsonify() body. "ndjson" / "json" are the streaming modes of
+/api/books. Peak Python memory is measured with tracemalloc; the streamed
+body is consumed chunk by chunk, like a real client would.
+
+Run from the repository root:
+    python benchmarks/bench_streaming.py --rows 10000 50000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from flask import jsonify
+
+from common import init_db, load_app, report
+
+
+def seed(mod, rows):
+    with mod.app.app_context():
+        mod.db.session.execute(mod.Book.__table__.delete())
+        mod.db.session.execute(
+            mod.Book.__table__.insert(),
+            [{'title': f'Book {i}', 'author': f'Author {i % 500}', 'year': 1950 + i % 70,
+              'isbn': f'isbn-{i}'} for i in range(rows)]
+        )
+        mod.db.session.commit()
+
+
+def buffered(mod):
+    with mod.app.test_request_context('/api/books'):
+        books = mod.Book.query.all()
+        return len(jsonify({'success': True, 'books': [mod.book_serializer.dump(b) for b in books]}).get_data())
+
+
+def streamed(mod, mode):
+    client = mod.app.test_client()
+    response = client.get(f'/api/books?stream={mode}', buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'bytes_sent': size, 'seconds': round(elapsed, 3), 'peak_mb': round(peak / 1024 / 1024, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000])
+    args = parser.parse_args()
+
+    mod = load_app('part-4')
+    init_db(mod)
+    results = []
+    for rows in args.rows:
+        seed(mod, rows)
+        for name, fn, fn_args in (('buffered', buffered, (mod,)),
+                                  ('ndjson', streamed, (mod, 'ndjson')),
+                                  ('json', streamed, (mod, 'json'))):
+            results.append({'rows': rows, 'mode': name, **measure(fn, *fn_args)})
+
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Check: no N+1 queries on list pages and list APIs
+==================================================
+Seeds each app, requests its list endpoints and fails (exit code 1) if an
+endpoint runs more SQL statements than its budget. The budgets do not depend
+on the number of rows, so a page that goes back to one query per row fails
+as soon as there is more than a handful of rows.
+
+Run from the repository root (e.g. in CI):
+    python benchmarks/check_query_counts.py
+"""
+
+import sys
+
+from common import assert_max_queries, init_db, load_app
+
+ROWS = 30  # More rows than any budget below
+
+
+def seed_school(mod, teachers=False):
+    init_db(mod)
+    with mod.app.app_context():
+        courses = mod.Course.query.all()
+        for i in range(ROWS):
+            course = courses[i % len(courses)]
+            mod.db.session.add(mod.Student(name=f'Student {i}', email=f's{i}@example.com', course_id=course.id))
+            if teachers:
+                mod.db.session.add(mod.Teacher(name=f'Teacher {i}', email=f't{i}@example.com', course_id=course.id))
+        mod.db.session.commit()
+
+
+def seed_library(mod):
+    with mod.app.app_context():
+        mod.db.create_all()
+        authors = [mod.Author(name=f'Author {i}') for i in range(ROWS)]
+        mod.db.session.add_all(authors)
+        mod.db.session.flush()
+        mod.db.session.add_all([mod.Book(title=f'Book {i}', year=2000, author_id=a.id)
+                                for i, a in enumerate(authors)])
+        mod.db.session.commit()
+
+
+CHECKS = [
+    # (part, seed function, [(path, max queries)])
+    ('part-3', seed_school, [('/', 1), ('/courses', 1)]),
+    ('Exercise/part3', lambda mod: seed_school(mod, teachers=True),
+     [('/', 1), ('/courses', 1), ('/teachers', 1), ('/students/latest', 1), ('/teachers/sort/name', 1)]),
+    ('Exercise/Part4/exercise 1', seed_library, [('/api/books', 1), ('/api/authors', 2)]),
+    ('Exercise/Part4/exercise 2', seed_library, [('/api/books', 1), ('/api/authors', 1)]),
+    ('Exercise/Part4/exercise 3/backend', seed_library,
+     [('/api/books', 1), ('/api/books-with-pagination?per_page=20', 2)]),
+    ('Exercise/Part4/exercise 4', seed_library, [('/api/books-with-sorting?sort=title', 1)]),
+]
+
+
+def main():
+    failures = 0
+    for part, seed, endpoints in CHECKS:
+        mod = load_app(part)
+        seed(mod)
+        with mod.app.app_context():
+            engine = mod.db.engine
+        for path, limit in endpoints:
+            try:
+                count = assert_max_queries(mod.app, engine, path, limit)
+                print(f'ok    {part} {path}: {count} queries')
+            except AssertionError as e:
+                failures += 1
+                print(f'FAIL  {part} {e}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Check: no full table scans on big tables
+=========================================
+Seeds each app with more rows than THRESHOLD, requests its endpoints,
+captures every SELECT they run and asks the database for its query plan
+(EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL). Exits with code 1
+if a plan reads a whole table (no index) that holds more than THRESHOLD rows.
+
+Pages that deliberately list every row (e.g. the part-3 index page) are
+not registered here - they scan by design.
+
+Run from the repository root (e.g. in CI):
+    python benchmarks/check_query_plans.py --threshold 1000
+"""
+
+import argparse
+import re
+import sys
+
+from sqlalchemy import func, inspect, select, table
+
+from common import count_queries, init_db, load_app
+
+ROWS = 3000
+
+
+def seed_books(mod):
+    init_db(mod)
+    with mod.app.app_context():
+        books = ({'title': f'Book {i}', 'author': f'Author {i % 300}', 'year': 1950 + i % 70} for i in range(ROWS))
+        mod.bulk_load.load_rows(mod.db.engine, mod.Book.__table__, books)
+
+
+def seed_students(mod):
+    init_db(mod)
+    with mod.app.app_context():
+        course_ids = [course.id for course in mod.Course.query.all()]
+        rows = [{'name': f'Student {i}', 'email': f's{i}@example.com', 'course_id': course_ids[i % 3]}
+                for i in range(ROWS)]
+        mod.db.session.execute(mod.Student.__table__.insert(), rows)
+        if hasattr(mod, 'Teacher'):
+            mod.db.session.execute(mod.Teacher.__table__.insert(),
+                                   [dict(row, email=f't{i}@example.com') for i, row in enumerate(rows)])
+        mod.db.session.commit()
+
+
+def seed_library(mod):
+    with mod.app.app_context():
+        mod.db.create_all()
+        mod.db.session.execute(mod.Author.__table__.insert(), [{'name': f'Author {i}'} for i in range(ROWS // 10)])
+        mod.db.session.execute(mod.Book.__table__.insert(), [
+            {'title': f'Book {i}', 'year': 1950 + i % 70, 'author_id': 1 + i % (ROWS // 10)} for i in range(ROWS)
+        ])
+        mod.db.session.commit()
+
+
+CHECKS = [
+    # (part, seed function, endpoints whose queries must use indexes on big tables)
+    ('part-4', seed_books, ['/api/books', '/api/books?sort=title&order=desc', '/api/books?sort=id',
+                            '/api/books/search?year=1990', '/api/books/search?q=book',
+                            '/api/books/search?author=author', '/api/books/7']),
+    ('part-3', seed_students, ['/courses', '/edit/5']),
+    ('Exercise/part3', seed_students, ['/courses', '/students/course/Data Science',
+                                       '/teachers/course/Data Science', '/students/latest', '/teachers/latest']),
+    ('Exercise/Part4/exercise 4', seed_library, ['/api/books-with-sorting?sort=year&order=desc',
+                                                 '/api/books-with-sorting?sort=created_at']),
+    ('Exercise/part 5/exercise 2', init_db, ['/test']),
+]
+
+
+def table_sizes(engine):
+    with engine.connect() as conn:
+        return {name: conn.execute(select(func.count()).select_from(table(name))).scalar()
+                for name in inspect(engine).get_table_names()}
+
+
+def full_scans(engine, statement, parameters):
+    """Names of the tables (or aliases) a plan reads without an index"""
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            plan = [row[0] for row in conn.exec_driver_sql('EXPLAIN ' + statement, parameters)]
+            return re.findall(r'Seq Scan on (\w+)', '\n'.join(plan))
+        plan = [row[3] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+    # 'SCAN student' as the only step (apart from 'SEARCH course USING INTEGER PRIMARY KEY'
+    # lookups for a join), with a LIMIT and no WHERE: walks the primary key in order
+    # and stops after LIMIT rows
+    steps = [line for line in plan if not line.startswith('SEARCH ')]
+    if len(steps) == 1 and re.fullmatch(r'SCAN \w+', steps[0]) and re.search(r'\bLIMIT\b', statement) \
+            and not re.search(r'\bWHERE\b', statement):
+        return []
+    # 'SCAN book USING INDEX ix_book_title' for an ORDER BY (no sort step): the index gives the order
+    ordered_by_index = re.search(r'\bORDER BY\b', statement) and not any('TEMP B-TREE' in line for line in plan)
+    scans = []
+    for line in plan:
+        match = re.fullmatch(r'SCAN (\w+)( USING (?:COVERING )?INDEX \w+)?', line)
+        if match and not (match.group(2) and ordered_by_index):
+            scans.append(match.group(1))
+    return scans
+
+
+def real_table(name, statement):
+    """Map an alias like course_1 back to its table using '... course AS course_1'"""
+    match = re.search(rf'(\w+) AS {name}\b', statement)
+    return match.group(1) if match else name
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threshold', type=int, default=1000, help='tables with more rows must not be scanned')
+    args = parser.parse_args()
+
+    failures = 0
+    for part, seed, paths in CHECKS:
+        mod = load_app(part)
+        seed(mod)
+        with mod.app.app_context():
+            engine = mod.db.engine
+        sizes = table_sizes(engine)
+
+        for path in paths:
+            with count_queries(engine) as queries:
+                mod.app.test_client().get(path).close()
+            problems = set()
+            for statement, parameters in zip(queries['statements'], queries['parameters']):
+                if not statement.lstrip().upper().startswith('SELECT') or parameters is None:
+                    continue
+                for name in full_scans(engine, statement, parameters):
+                    name = real_table(name, statement)
+                    if sizes.get(name, 0) > args.threshold:
+                        problems.add(f'{name} ({sizes[name]} rows)')
+            if problems:
+                failures += 1
+                print(f'FAIL  {part} {path}: full scan of {", ".join(sorted(problems))}')
+            else:
+                print(f'ok    {part} {path}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark Helpers
+=================
+Shared code for the scripts in this folder.
+
+Every part is a standalone `app.py` that keeps its database next to itself
+(or in its instance/ folder), so `load_app()` copies the part into a
+temporary directory first. Benchmarks never touch your real .db files.
+
+Requests are sent with Flask's test client from several threads, so no
+server or network is needed.
+"""
+
+import contextlib
+import importlib.util
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def copy_part(part):
+    """Copy `<part>` (without its databases) into a temporary folder and return the copy
+
+    dbtools/ is copied next to it, at the same relative path as in the
+    repository, so the part's `sys.path` line finds it.
+    """
+    root = tempfile.mkdtemp(prefix=f'bench-{os.path.basename(part)}-')
+    ignore = shutil.ignore_patterns('*.db', 'instance', '__pycache__')
+    shutil.copytree(os.path.join(ROOT, 'dbtools'), os.path.join(root, 'dbtools'), ignore=ignore)
+    workdir = os.path.join(root, part)
+    shutil.copytree(os.path.join(ROOT, part), workdir, ignore=ignore)
+    return workdir
+
+
+def load_app(part, module='app'):
+    """Import `<part>/app.py` from a throwaway copy and return the module
+
+    Parts with an application factory get `mod.app = mod.create_app()`, so
+    every script can use `mod.app` whichever kind of app.py it loaded.
+    """
+    workdir = copy_part(part)
+    os.chdir(workdir)  # Relative paths like 'students.db' now land in the copy
+
+    name = f'bench_{os.path.basename(part).replace("-", "_")}_{module}'
+    spec = importlib.util.spec_from_file_location(name, os.path.join(workdir, f'{module}.py'))
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    if hasattr(mod, 'create_app') and not hasattr(mod, 'app'):
+        mod.app = mod.create_app()
+    return mod
+
+
+def init_db(mod):
+    """Create the tables and sample rows (init_db() needs an app context)"""
+    with mod.app.app_context():
+        mod.init_db()
+
+
+@contextlib.contextmanager
+def count_queries(engine):
+    """Count the SQL statements run on `engine` inside the `with` block
+
+        with count_queries(db.engine) as queries:
+            client.get('/api/books')
+        assert queries['count'] <= 2
+    """
+    from sqlalchemy import event
+
+    queries = {'count': 0, 'statements': [], 'parameters': []}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        queries['count'] += 1
+        queries['statements'].append(statement)
+        queries['parameters'].append(None if executemany else parameters)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def assert_max_queries(app, engine, path, limit, **kwargs):
+    """Request `path` and fail if it runs more than `limit` SQL statements"""
+    with count_queries(engine) as queries:
+        response = app.test_client().get(path, **kwargs)
+    assert response.status_code == 200, f'{path} returned {response.status_code}'
+    assert queries['count'] <= limit, (
+        f'{path} ran {queries["count"]} queries (limit {limit}):\n' + '\n'.join(queries['statements'])
+    )
+    return queries['count']
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(app, method, path, requests=1000, concurrency=4, warmup=0, seed=None, label=None, **kwargs):
+    """Send `requests` calls to `path` from `concurrency` threads and time them
+
+    `path` (and any keyword argument, e.g. `data`) may be a function of a
+    random.Random that builds a fresh value for every call, like
+    `lambda rng: f'/edit/{rng.randint(1, 1000)}'`. Thread n uses
+    random.Random(seed + n), so the same seed sends the same requests.
+    `warmup` calls are sent first and not timed. 4xx/5xx answers are
+    counted in `errors`.
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_thread = max(1, requests // concurrency)
+
+    def call(client, rng):
+        url = path(rng) if callable(path) else path
+        options = {key: value(rng) if callable(value) else value for key, value in kwargs.items()}
+        start = time.perf_counter()
+        response = client.open(url, method=method, **options)
+        response.close()
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+        return time.perf_counter() - start
+
+    warmup_client, warmup_rng = app.test_client(), random.Random(seed)
+    for _ in range(warmup):
+        call(warmup_client, warmup_rng)
+    errors.clear()
+
+    def worker(n):
+        client = app.test_client()
+        rng = random.Random(None if seed is None else seed + n + 1)
+        mine = [call(client, rng) for _ in range(per_thread)]
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'route': label or f'{method} {path}',
+        'requests': len(latencies),
+        'errors': len(errors),
+        'concurrency': concurrency,
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def report(results):
+    """Print results as JSON (easy to save and compare between runs)"""
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,19 @@
+"""
+dbtools: helpers shared by the tutorial parts
+=============================================
+Code that several parts use in exactly the same way lives here, so each
+part's app.py only shows what that part teaches:
+
+- bulk_load: stream CSV / NDJSON rows into a table in batches (flask load / seed)
+- cursors: keyset pagination cursors of the part-4 Book API (app.py and async_app.py)
+- pool: the connection pool of the raw sqlite3 apps (parts 1 and 2)
+- prometheus: request and connection pool metrics at GET /metrics
+- serializers: read-only listings as slotted records instead of ORM objects
+- serve: the `flask --app app serve` command (gunicorn, forked workers)
+- sqlite: the SQLite PRAGMA profile (WAL, page cache, mmap) for new connections
+- templates: compiled template cache and the {% cache %} fragment tag
+- timing: time every SQL statement (/debug/queries, slow-query log, Server-Timing)
+
+The parts are run from their own folder (`cd part-4 && python app.py`), so
+each app.py puts the repository root on sys.path before importing dbtools.
+"""
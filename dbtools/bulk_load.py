@@ -0,0 +1,101 @@
+"""
+Bulk loader (flask load / flask seed)
+=====================================
+Creating one ORM object per row is slow and keeps every object in memory.
+load_rows() streams rows and inserts them in batches instead:
+  - PostgreSQL (psycopg2): COPY ... FROM STDIN, the fastest way into Postgres
+  - everything else: executemany of a core insert()
+All batches run in ONE transaction (on SQLite: one fsync instead of thousands).
+
+A batch is one statement with one column list, so rows that name different
+columns (e.g. some CSV lines with an id, some without) go into separate
+batches.
+"""
+
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+import click
+
+
+def read_rows(path):
+    """Yield one dict per row from a .csv or .ndjson / .jsonl file"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def prepare_row(table, row):
+    """Keep known columns, turn CSV strings into Python values, fill in defaults"""
+    clean = {}
+    for col in table.columns:
+        value = row.get(col.key)
+        if value is None or value == '':
+            if col.primary_key:
+                continue  # Let the database number the row
+            value = None
+            if col.default is not None:  # COPY skips Python-side defaults, so apply them here
+                value = col.default.arg(None) if col.default.is_callable else col.default.arg
+        elif isinstance(value, str) and col.type.python_type is not str:
+            value = datetime.fromisoformat(value) if col.type.python_type is datetime else col.type.python_type(value)
+        clean[col.key] = value
+    return clean
+
+
+def in_row_batches(rows, size):
+    """Lists of up to `size` rows that all have the same keys (a row with new keys starts a new batch)"""
+    batch, keys = [], None
+    for row in rows:
+        if batch and (len(batch) >= size or row.keys() != keys):
+            yield batch
+            batch = []
+        if not batch:
+            keys = row.keys()
+        batch.append(row)
+    if batch:
+        yield batch
+
+
+def copy_rows(raw_connection, table, batch):
+    """Send one batch with PostgreSQL's COPY FROM STDIN (CSV format)"""
+    columns = list(batch[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow(['\\N' if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    with raw_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+        )
+
+
+def load_rows(engine, table, rows, batch_size=5000):
+    """Insert an iterable of dicts into `table`. Returns (row count, method used)"""
+    use_copy = engine.dialect.name == 'postgresql' and engine.driver == 'psycopg2'
+    count = 0
+    with engine.begin() as conn:  # One transaction for the whole load
+        for batch in in_row_batches((prepare_row(table, row) for row in rows), batch_size):
+            if use_copy:
+                copy_rows(conn.connection.dbapi_connection, table, batch)
+            else:
+                conn.execute(table.insert(), batch)  # executemany
+            count += len(batch)
+    return count, 'COPY' if use_copy else 'executemany'
+
+
+def load_and_report(engine, table, rows, batch_size=5000):
+    """load_rows(), then print how many rows it loaded and how fast (for the CLI commands)"""
+    started = time.perf_counter()
+    count, method = load_rows(engine, table, rows, batch_size)
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    click.echo(f'Loaded {count} rows into {table.name} with {method} '
+               f'in {elapsed:.2f}s ({count / elapsed:,.0f} rows/sec)')
+    return count
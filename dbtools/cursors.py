@@ -0,0 +1,47 @@
+"""
+Keyset pagination cursors of the part-4 Book API
+================================================
+A cursor remembers the last row of a page: [sort, sort value, id], as JSON
+in URL-safe base64. app.py and async_app.py both read and write them here,
+so a next_cursor from one app works in the other.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+CURSOR_VALUE_TYPES = {  # JSON type of the sort value each cursor carries
+    'created_at': str,  # ISO string (null can't be compared with < and >)
+    'id': int,
+    'title': str,
+    'relevance': (int, float),  # Search rank (app.py only)
+}
+
+
+class CursorError(ValueError):
+    """Raised for a cursor the client tampered with or made up"""
+
+
+def encode_cursor(sort, value, last_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor, sort):
+    """Cursor string -> (sort value, last id). Raises CursorError"""
+    try:
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise CursorError('Invalid cursor') from e
+    if cursor_sort != sort or not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise CursorError('Cursor does not match this sort order')
+    if not isinstance(value, CURSOR_VALUE_TYPES[sort]) or isinstance(value, bool):  # e.g. a list: SQL would fail
+        raise CursorError('Invalid cursor')
+    if sort == 'created_at':
+        try:
+            value = datetime.fromisoformat(value)
+        except (ValueError, TypeError) as e:
+            raise CursorError('Invalid cursor') from e
+    return value, last_id
@@ -0,0 +1,73 @@
+"""
+Connection pool for the raw sqlite3 apps (parts 1 and 2)
+========================================================
+Opening a connection means opening the file, reading the schema and applying
+the PRAGMAs; a connection that is kept open also keeps SQLite's page cache
+warm. The pool keeps up to DB_POOL_SIZE idle connections and lends one to
+each request (the app stores it on flask.g and gives it back in teardown).
+
+The idle connections sit in one queue shared by all threads, not in a
+per-thread slot: the development server starts a new thread for every
+request, so a per-thread connection would never be used twice.
+
+Every pool is closed when the process exits; a pool whose app is gone is
+simply garbage collected (with its connections).
+"""
+
+import atexit
+import queue
+import threading
+import weakref
+
+pools = weakref.WeakSet()  # Every pool that is still in use, for close_all_pools()
+
+
+class ConnectionPool:
+    """Keep a few open connections around and lend one to each request"""
+
+    def __init__(self, connect):
+        self.connect = connect
+        self.idle = queue.LifoQueue()  # LIFO: reuse the most recent (warmest cache) connection first
+        self.lock = threading.Lock()
+        self.opened = []  # Every connection we created, so we can close them at exit
+        pools.add(self)
+
+    def checkout(self):
+        """Borrow an idle connection, or open a new one if none is free"""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            conn = self.connect()
+            with self.lock:
+                self.opened.append(conn)
+            return conn
+
+    def checkin(self, conn, max_idle):
+        """Give a connection back (closed instead if enough are already idle)"""
+        if conn.in_transaction:
+            conn.rollback()  # Never hand out a connection with half-finished work
+        if self.idle.qsize() < max_idle:
+            self.idle.put(conn)
+            return
+        with self.lock:
+            self.opened.remove(conn)
+        conn.close()
+
+    def close_all(self):
+        with self.lock:
+            for conn in self.opened:
+                conn.close()
+            self.opened.clear()
+            self.idle = queue.LifoQueue()
+
+    def forget(self):
+        """After a fork: start empty, leaving the parent's connections alone (closing would break them)"""
+        self.lock = threading.Lock()
+        self.opened = []
+        self.idle = queue.LifoQueue()
+
+
+@atexit.register  # Registered once, however many apps (and pools) are created
+def close_all_pools():
+    for pool in list(pools):
+        pool.close_all()
@@ -0,0 +1,290 @@
+"""
+Metrics (GET /metrics, Prometheus text format)
+==============================================
+Request count and latency per route, requests in flight, SQL statements per
+route and connection pool usage per database. Point Prometheus (or curl) at
+/metrics.
+
+Several worker processes (e.g. gunicorn -w 4)? Each one only sees its own
+requests, so set METRICS_DIR to a folder they all share: every process
+writes its numbers to METRICS_DIR/metrics-<pid>.json once a second and
+/metrics adds the files up. Empty the folder when you redeploy. A worker
+that was killed (SIGKILL, out of memory) can't clean up after itself, so
+/metrics retires its file: the counters still count towards the totals,
+its gauges (requests in flight, pool usage) are dropped.
+
+/metrics is only served in debug mode or with EXPOSE_METRICS=1: route names
+and pool sizes are nobody's business but yours.
+
+An app adds its own metrics with metrics.define() and its own gauges with
+metrics.collectors[name] = function (run right before the numbers are read).
+A collector replaces its gauges with metrics.replace(), so a database that is
+gone (e.g. the engines of an earlier create_app()) drops out of them.
+"""
+
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # Seconds
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)  # Seconds
+
+METRIC_TYPES = {  # name: (type, help text)
+    'http_requests_total': ('counter', 'Requests handled, by route, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Time to build the response, by route and method'),
+    'http_requests_in_flight': ('gauge', 'Requests being handled right now'),
+    'db_statements_total': ('counter', 'SQL statements run, by route and method'),
+    'db_pool_checkouts_total': ('counter', 'Connections handed out by the pool, per database'),
+    'db_pool_wait_seconds': ('histogram', 'Time spent getting a connection from the pool, per database'),
+    'db_pool_size': ('gauge', 'Connections the pool keeps open (pool_size), per database'),
+    'db_pool_checked_out': ('gauge', 'Connections in use right now, per database'),
+    'db_pool_overflow': ('gauge', 'Connections open beyond pool_size (max_overflow), per database'),
+}
+HISTOGRAM_BUCKETS = {'http_request_duration_seconds': REQUEST_BUCKETS, 'db_pool_wait_seconds': POOL_WAIT_BUCKETS}
+LABEL_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+
+
+def label_string(labels):
+    """{'route': '/', 'method': 'GET'} -> 'method="GET",route="/"'"""
+    return ','.join(f'{key}="{str(value).translate(LABEL_ESCAPES)}"' for key, value in sorted(labels.items()))
+
+
+class Metrics:
+    """Counters, gauges and histograms of this process, kept in plain dicts
+
+    values = {type: {metric name: {label string: number}}}; a histogram's number
+    is a list: one count per bucket, one for +Inf, then the sum.
+    """
+
+    def __init__(self, folder=None, flush_every=1.0):
+        self.lock = threading.Lock()
+        self.values = {'counter': {}, 'gauge': {}, 'histogram': {}}
+        self.types = dict(METRIC_TYPES)
+        self.buckets = dict(HISTOGRAM_BUCKETS)
+        self.collectors = {}  # name -> function that refreshes gauges right before the numbers are read
+        self.folder = folder
+        self.flush_every = flush_every
+        self.flusher_pid = None
+
+    def define(self, name, kind, help_text, buckets=None):
+        """Add a metric of the app's own ('counter', 'gauge', or 'histogram' with its buckets)"""
+        self.types[name] = (kind, help_text)
+        if buckets:
+            self.buckets[name] = buckets
+
+    def series(self, name, labels):
+        return self.values[self.types[name][0]].setdefault(name, {}), label_string(labels)
+
+    def add(self, name, amount=1, **labels):
+        with self.lock:
+            series, key = self.series(name, labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            series, key = self.series(name, labels)
+            series[key] = value
+
+    def replace(self, name, samples):
+        """Set every series of a gauge at once: samples = [(labels, value), ...]; others are dropped"""
+        with self.lock:
+            self.values[self.types[name][0]][name] = {label_string(labels): value for labels, value in samples}
+
+    def observe(self, name, value, **labels):
+        buckets = self.buckets[name]
+        with self.lock:
+            series, key = self.series(name, labels)
+            counts = series.setdefault(key, [0] * (len(buckets) + 2))
+            counts[bisect.bisect_left(buckets, value)] += 1
+            counts[-1] += value
+
+    def dump(self):
+        """This process's numbers as JSON text"""
+        for collect in list(self.collectors.values()):  # init_app() may swap one meanwhile
+            collect()
+        with self.lock:
+            return json.dumps(self.values)
+
+    def start_flushing(self):
+        """Multi-process mode: write this process's numbers to the shared folder every second"""
+        with self.lock:
+            if not self.folder or self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()  # Once per process: threads don't survive a fork
+        threading.Thread(target=self.flush_forever, daemon=True).start()
+
+    def flush_forever(self):
+        while True:
+            time.sleep(self.flush_every)
+            self.flush()
+
+    def flush(self):
+        path = os.path.join(self.folder, f'metrics-{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            f.write(self.dump())
+        os.replace(path + '.tmp', path)  # Readers never see a half-written file
+
+    def reset(self):
+        """After a fork: start from zero (the parent's numbers stay in the parent's file)"""
+        self.values = {'counter': {}, 'gauge': {}, 'histogram': {}}
+        self.lock = threading.Lock()
+
+    def close(self):
+        """At exit: keep the counters for the totals, but this process has nothing in flight anymore"""
+        if self.flusher_pid == os.getpid():
+            self.collectors.clear()
+            with self.lock:
+                self.values['gauge'].clear()
+            self.flush()
+
+    def read_all(self):
+        """Numbers of every process: add up counters, gauges and histogram buckets"""
+        if not self.folder:
+            return json.loads(self.dump())
+        self.flush()  # Include this process's latest numbers
+        self.retire_dead_processes()
+        total = {'counter': {}, 'gauge': {}, 'histogram': {}}
+        for path in glob.glob(os.path.join(self.folder, '*-*.json')):  # metrics-<pid>.json and retired-<pid>.json
+            try:
+                with open(path) as f:
+                    values = json.load(f)
+            except (OSError, ValueError):
+                continue  # The file vanished or is being replaced
+            for kind, metrics_of_kind in values.items():
+                for name, series in metrics_of_kind.items():
+                    merged = total[kind].setdefault(name, {})
+                    for key, value in series.items():
+                        if kind == 'histogram':
+                            merged[key] = [a + b for a, b in zip(merged.get(key, [0] * len(value)), value)]
+                        else:
+                            merged[key] = merged.get(key, 0) + value
+        return total
+
+    def retire_dead_processes(self):
+        """Turn metrics-<pid>.json of every process that is gone into retired-<pid>.json, without gauges"""
+        if os.name != 'posix':  # os.kill(pid, 0) only asks "are you there?" on Unix
+            return
+        for path in glob.glob(os.path.join(self.folder, 'metrics-*.json')):
+            pid = os.path.basename(path)[len('metrics-'):-len('.json')]
+            if not pid.isdigit() or process_alive(int(pid)):
+                continue
+            claimed = f'{path}.{os.getpid()}.retiring'
+            try:
+                os.rename(path, claimed)  # Only one process wins the rename, so nothing is counted twice
+            except OSError:
+                continue
+            try:
+                with open(claimed) as f:
+                    values = json.load(f)
+                values['gauge'] = {}  # Nothing is in flight in a dead process
+                retired = os.path.join(self.folder, f'retired-{pid}.json')
+                with open(retired + '.tmp', 'w') as f:
+                    json.dump(values, f)
+                os.replace(retired + '.tmp', retired)
+            except (OSError, ValueError):
+                pass  # Unreadable: drop it
+            os.remove(claimed)
+
+    def render(self, values):
+        """Prometheus text exposition format"""
+        def sample(name, labels, value):
+            return f'{name}{{{labels}}} {value}' if labels else f'{name} {value}'
+
+        lines = []
+        for name, (kind, help_text) in self.types.items():
+            series = values[kind].get(name)
+            if not series:
+                continue
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for labels, value in sorted(series.items()):
+                if kind != 'histogram':
+                    lines.append(sample(name, labels, value))
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets[name] + ('+Inf',), value):
+                    cumulative += count  # Prometheus buckets count everything <= le
+                    lines.append(sample(f'{name}_bucket', ','.join(filter(None, [labels, f'le="{bound}"'])), cumulative))
+                lines.append(sample(f'{name}_sum', labels, value[-1]))
+                lines.append(sample(f'{name}_count', labels, cumulative))
+        return '\n'.join(lines) + '\n'
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)  # Signal 0: no signal is sent, only checks the process exists
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, but belongs to another user
+    return True
+
+
+metrics = Metrics()  # One per process; init_app() sets its folder (METRICS_DIR)
+atexit.register(metrics.close)
+
+
+def collect_pool_stats(engines):
+    """engines: {'primary': engine, 'replica_0': engine, ...}"""
+    size, checked_out, overflow = [], [], []
+    for name, engine in engines.items():
+        pool = engine.pool
+        if hasattr(pool, 'checkedout'):  # QueuePool; SQLite in-memory databases use a simpler pool
+            labels = {'database': name}
+            size.append((labels, pool.size()))
+            checked_out.append((labels, pool.checkedout()))
+            overflow.append((labels, max(pool.overflow(), 0)))  # Negative while filling up
+    metrics.replace('db_pool_size', size)
+    metrics.replace('db_pool_checked_out', checked_out)
+    metrics.replace('db_pool_overflow', overflow)
+
+
+def count_checkout(name):
+    def listener(dbapi_connection, connection_record, connection_proxy):
+        metrics.add('db_pool_checkouts_total', database=name)
+    return listener
+
+
+def count_request_in_flight():
+    metrics.start_flushing()
+    metrics.add('http_requests_in_flight')
+
+
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'  # Unknown URLs share one label
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())  # Set by dbtools.timing
+    metrics.add('http_requests_total', route=route, method=request.method, status=response.status_code)
+    metrics.observe('http_request_duration_seconds', elapsed, route=route, method=request.method)
+    metrics.add('db_statements_total', g.get('db_statements', 0), route=route, method=request.method)
+    return response
+
+
+def count_request_done(exception):
+    metrics.add('http_requests_in_flight', -1)
+
+
+def prometheus_metrics():
+    return Response(metrics.render(metrics.read_all()), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app, engines):
+    """Request metrics, pool metrics for `engines` ({name: engine}) and GET /metrics
+
+    Reads METRICS_DIR and EXPOSE_METRICS from app.config. Call it after
+    dbtools.timing.init_app(), whose request timer the latency histogram uses.
+    """
+    metrics.folder = app.config['METRICS_DIR']
+    metrics.collectors['db_pool'] = lambda: collect_pool_stats(engines)  # Replaces an earlier app's
+    for name, engine in engines.items():
+        event.listen(engine, 'checkout', count_checkout(name))
+    app.before_request(count_request_in_flight)
+    app.after_request(record_request_metrics)
+    app.teardown_request(count_request_done)
+    if app.debug or app.config['EXPOSE_METRICS']:
+        app.add_url_rule('/metrics', 'prometheus_metrics', prometheus_metrics)
@@ -0,0 +1,101 @@
+"""
+Serializers: read-only rows as slotted records
+==============================================
+Model.query.all() builds a full ORM object for every row: every column is
+loaded, the object is tracked in the session's identity map and watched for
+changes. Read-only listings (a JSON list, an HTML table) need none of that.
+A Serializer declares the fields of a listing once; for a set of fields it
+works out, the first time that set is used:
+  - the columns to SELECT (only those: rows come back as plain tuples)
+  - a record class with __slots__ (no per-object __dict__) for one row
+  - the encoders of the fields that need one (datetime -> ISO string)
+Records have attributes like the ORM objects (templates use record.name the
+same way), and dump() turns a row into a dict for JSON.
+
+    book_serializer = Serializer('Book', id=Book.id, created_at=(Book.created_at, iso_datetime))
+    record_type = book_serializer.record_type(book_serializer.fieldset('id,title'))
+    rows = db.session.execute(select(*record_type.columns))
+    books = [record_type.dump(row) for row in rows]
+
+Benchmark (CPU and memory against ORM objects + to_dict(), part-4):
+    python benchmarks/bench_serializers.py
+"""
+
+import dataclasses
+import operator
+
+
+def iso_datetime(value):
+    return value.isoformat() if value is not None else None
+
+
+class FieldsError(ValueError):
+    """Raised for a ?fields= that names a field the serializer doesn't have"""
+
+
+class RecordType:
+    """One set of fields of a Serializer: its columns, its record class and its encoders"""
+
+    def __init__(self, name, fields, specs):
+        self.fields = fields
+        self.width = len(fields)
+        self.columns = [specs[field][0] for field in fields]
+        self.record_class = dataclasses.make_dataclass(name, fields, slots=True)  # Generated __init__ and __slots__
+        self.encoders = [(field, specs[field][1]) for field in fields if specs[field][1]]
+        if self.width > 1:
+            self.values = operator.attrgetter(*fields)  # record -> tuple of values
+        else:
+            self.values = lambda record: (getattr(record, fields[0]),)
+
+    def record(self, row):
+        """Row selected with self.columns (extra columns after them are ignored) -> record"""
+        record = self.record_class(*row[:self.width])
+        for field, encode in self.encoders:
+            setattr(record, field, encode(getattr(record, field)))
+        return record
+
+    def to_dict(self, record):
+        return dict(zip(self.fields, self.values(record)))
+
+    def dump(self, row):
+        """Row -> dict for the JSON"""
+        return self.to_dict(self.record(row))
+
+
+class Serializer:
+    """The fields of one model, declared once:
+
+        Serializer('Book', id=Book.id, created_at=(Book.created_at, iso_datetime))
+
+    A field is a column, or (column, encoder) when its value needs converting.
+    A column of a joined table works too (course_name=Course.name).
+    """
+
+    def __init__(self, name, /, **specs):  # /: a field may be called `name` too
+        self.name = name
+        self.specs = {field: spec if isinstance(spec, tuple) else (spec, None) for field, spec in specs.items()}
+        self.all_fields = tuple(self.specs)
+        self.record_types = {}  # Tuple of fields: RecordType, built on first use
+
+    def fieldset(self, text=None):
+        """'title,id' -> ('id', 'title'), in declaration order; None or '' -> every field"""
+        wanted = {field.strip() for field in (text or '').split(',')} - {''}
+        if not wanted:
+            return self.all_fields
+        unknown = wanted - self.specs.keys()
+        if unknown:
+            raise FieldsError(f'Unknown field(s): {", ".join(sorted(unknown))} '
+                              f'(choose from {", ".join(self.all_fields)})')
+        return tuple(field for field in self.all_fields if field in wanted)
+
+    def record_type(self, fields=None):
+        fields = fields or self.all_fields
+        record_type = self.record_types.get(fields)
+        if record_type is None:  # Two threads may both build it; they build the same thing
+            record_type = self.record_types[fields] = RecordType(f'{self.name}Record', fields, self.specs)
+        return record_type
+
+    def dump(self, obj, fields=None):
+        """An ORM object (e.g. a book just created) -> dict, same shape as dumped rows"""
+        record_type = self.record_type(fields)
+        return record_type.dump([getattr(obj, column.key) for column in record_type.columns])
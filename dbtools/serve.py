@@ -0,0 +1,56 @@
+"""
+Production server (flask --app app serve)
+=========================================
+app.run() is Flask's development server: one process, made for debugging.
+`serve` runs the app under gunicorn (pip install gunicorn; Linux and macOS)
+with several worker processes, each running a few threads. A Python process
+runs one thread at a time, so one worker per CPU core is what uses them all.
+  - preload: app.py is imported once and the workers are forked from it,
+    so they start fast and share the memory of the loaded code
+  - a forked worker inherits the parent's open database connections; the
+    app's reset_after_fork() drops them so two processes never share one
+  - kill -HUP <master pid> reloads gracefully: new workers start, old ones
+    finish their requests, then exit. (Preloaded code stays as it was:
+    restart the master after changing app.py.)
+"""
+
+import os
+
+import click
+from flask import current_app
+
+
+def run(app, host, port, workers, threads, timeout, post_fork):
+    """Serve `app` with gunicorn; post_fork(app) runs in every new worker"""
+    from gunicorn.app.base import BaseApplication  # Imported here: only `serve` needs it
+
+    class Server(BaseApplication):
+        def load_config(self):
+            settings = {'bind': f'{host}:{port}', 'workers': workers, 'threads': threads, 'timeout': timeout,
+                        'graceful_timeout': timeout, 'preload_app': True,
+                        'post_fork': lambda server, worker: post_fork(app)}
+            for name, value in settings.items():
+                self.cfg.set(name, value)
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+def make_command(reset_after_fork, prepare=None):
+    """The `serve` command: reset_after_fork(app) runs in every worker, prepare(app) once before forking"""
+    @click.command('serve')
+    @click.option('--host', default='127.0.0.1', show_default=True)
+    @click.option('--port', default=8000, show_default=True)
+    @click.option('--workers', default=os.cpu_count() or 1, show_default='one per CPU core', help='Worker processes')
+    @click.option('--threads', default=4, show_default=True, help='Threads per worker')
+    @click.option('--timeout', default=30, show_default=True, help='Seconds before a stuck worker is replaced')
+    def serve_command(host, port, workers, threads, timeout):
+        """Production server: WORKERS processes x THREADS threads (gunicorn); run init-db first"""
+        app = current_app._get_current_object()  # The app built by create_app() for this command
+        if prepare is not None:
+            prepare(app)
+        run(app, host, port, workers, threads, timeout, reset_after_fork)
+
+    return serve_command
@@ -0,0 +1,120 @@
+"""
+Template caching
+================
+Two caches make HTML pages cheaper:
+
+1. Bytecode cache: Jinja turns every template into Python code the first time
+   it is used. FileSystemBytecodeCache keeps that code in TEMPLATE_CACHE_DIR,
+   so a new worker process loads it instead of compiling again (a template
+   that changed is compiled again automatically). `flask --app app
+   compile-templates` fills it ahead of time; `serve` does it before forking.
+
+2. Fragment cache: {% cache key, ttl %} ... {% endcache %} renders its block
+   once and then serves the same HTML until `ttl` seconds pass (default
+   FRAGMENT_CACHE_TTL). Put everything the block shows into the key, e.g.
+       {% cache ('student', student.id, student.updated_at, student.course_name) %}
+   updated_at changes on every edit, so an edited row gets a new key and is
+   rendered again; rows nobody touched come straight from the cache.
+   Each worker process has its own fragment cache.
+   GET /debug/fragment-cache shows hits and misses; like /debug/queries it is
+   only served in debug mode or with EXPOSE_FRAGMENT_CACHE_STATS=1.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import click
+from flask import current_app, jsonify
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """Rendered fragments by key: the least recently used go first, each expires after its ttl"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, html), oldest first
+        self.lock = threading.Lock()  # Requests render from several threads at once
+        self.hits = self.misses = 0
+
+    def get_or_render(self, key, ttl, render):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)  # Mark as recently used
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        html = render()  # Outside the lock: other threads keep reading meanwhile
+        with self.lock:
+            self.entries[key] = (now + ttl, html)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return html
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+
+class FragmentCacheExtension(Extension):
+    """The {% cache key[, ttl] %} ... {% endcache %} tag"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        args.append(parser.parse_expression() if parser.stream.skip_if('comma') else nodes.Const(None))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('render_cached', args), [], [], body).set_lineno(lineno)
+
+    def render_cached(self, key, ttl, caller):
+        if isinstance(key, list):
+            key = tuple(key)  # Dict keys must be hashable
+        ttl = current_app.config['FRAGMENT_CACHE_TTL'] if ttl is None else ttl
+        return current_app.extensions['fragment_cache'].get_or_render(key, ttl, caller)
+
+
+def compile_templates(app):
+    """Load every template now (and write the bytecode cache) instead of on the first request"""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+@click.command('compile-templates')
+def compile_templates_command():
+    """Fill the template bytecode cache (e.g. in a deploy step)"""
+    click.echo(f'{compile_templates(current_app)} templates compiled')
+
+
+def fragment_cache_stats():
+    """Hit / miss counters of {% cache %} fragments"""
+    return jsonify(current_app.extensions['fragment_cache'].stats())
+
+
+def init_app(app, fragments=True):
+    """Bytecode cache, and with `fragments` the {% cache %} tag
+
+    Reads TEMPLATE_CACHE_DIR (None = off), and with `fragments`
+    FRAGMENT_CACHE_TTL, FRAGMENT_CACHE_MAX_ENTRIES and
+    EXPOSE_FRAGMENT_CACHE_STATS, from app.config.
+    Call it in create_app(), before anything is rendered: the Jinja
+    environment reads jinja_options once.
+    """
+    options = dict(app.jinja_options)
+    if fragments:
+        options['extensions'] = [*options.get('extensions', ()), FragmentCacheExtension]
+        app.extensions['fragment_cache'] = FragmentCache(app.config['FRAGMENT_CACHE_MAX_ENTRIES'])
+        if app.debug or app.config['EXPOSE_FRAGMENT_CACHE_STATS']:
+            app.add_url_rule('/debug/fragment-cache', 'fragment_cache_stats', fragment_cache_stats)
+    if app.config['TEMPLATE_CACHE_DIR']:
+        os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        options['bytecode_cache'] = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+    app.jinja_options = options
@@ -0,0 +1,261 @@
+"""
+Query timing
+============
+Every SQL statement is timed. The numbers end up in three places:
+- GET /debug/queries: latency histogram and rows returned per statement
+- the slow-query log: statements slower than SLOW_QUERY_MS
+- a Server-Timing header on every response (browser dev tools -> Network -> Timing)
+
+Raw sqlite3 apps (parts 1 and 2) open their connections with
+`factory=TimedConnection`. Flask-SQLAlchemy apps hand their engines to
+init_app(), which times statements with engine events instead.
+
+GET /debug/queries shows raw SQL, so it is only served in debug mode or
+with EXPOSE_QUERY_STATS=1.
+"""
+
+import bisect
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, jsonify, request
+
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)  # Upper bounds of the histogram buckets
+PLACEHOLDER_LIST = re.compile(r'(?:\?|%\(\w+\)s|%s)(?:, (?:\?|%\(\w+\)s|%s))+')  # ?, ?, ? or %(id_1)s, %(id_2)s
+REPEATED_GROUP = re.compile(r'(\([^()]*\))(?:, \1)+')  # VALUES (?, ...), (?, ...), ...
+
+slow_query_log = logging.getLogger('slow_queries')
+
+
+def statement_key(statement):
+    """One histogram per statement shape: 'IN (?, ?)' and 'IN (?, ?, ?)' share one"""
+    statement = PLACEHOLDER_LIST.sub('?, ...', statement)
+    return ' '.join(REPEATED_GROUP.sub(r'\1, ...', statement).split())
+
+
+class QueryStats:
+    """Latency histogram and row count for every distinct SQL statement"""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Requests record from several threads at once
+        self.statements = {}
+
+    def record(self, statement, elapsed_ms, rows):
+        with self.lock:
+            stats = self.statements.setdefault(statement, {
+                'count': 0, 'total_ms': 0.0, 'rows': 0, 'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            })
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['rows'] += rows
+            stats['buckets'][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def snapshot(self):
+        """Statements with the most total time first"""
+        labels = [f'<={bound}ms' for bound in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+        with self.lock:
+            report = [{
+                'statement': statement,
+                'count': stats['count'],
+                'total_ms': round(stats['total_ms'], 3),
+                'avg_ms': round(stats['total_ms'] / stats['count'], 3),
+                'rows': stats['rows'],
+                'histogram': dict(zip(labels, stats['buckets'])),
+            } for statement, stats in self.statements.items()]
+        return sorted(report, key=lambda stats: stats['total_ms'], reverse=True)
+
+
+query_stats = QueryStats()
+
+
+def record_query(statement, elapsed_ms, rows):
+    """Book-keeping for one finished statement"""
+    statement, rows = statement_key(statement), max(rows, 0)  # rowcount is -1 when unknown
+    query_stats.record(statement, elapsed_ms, rows)
+    if has_request_context():  # This request's totals, sent back in Server-Timing
+        g.db_ms = g.get('db_ms', 0.0) + elapsed_ms
+        g.db_statements = g.get('db_statements', 0) + 1
+        g.db_rows = g.get('db_rows', 0) + rows
+    if has_app_context() and elapsed_ms >= current_app.config['SLOW_QUERY_MS']:
+        route = f'{request.method} {request.path}' if has_request_context() else '-'
+        slow_query_log.warning('%.1fms %s rows=%d %s', elapsed_ms, route, rows, statement)
+
+
+# -----------------------------------------------------------------------------
+# sqlite3 cursors
+# -----------------------------------------------------------------------------
+
+class FetchTimedCursor(sqlite3.Cursor):
+    """sqlite3 cursor that keeps the clock running until the last row is fetched
+
+    SQLite works lazily: execute() only finds the first row and every fetch does
+    more of the work. So a SELECT is recorded once its rows are used up (or the
+    cursor is closed), fetch time and row count included. Whoever runs the
+    statement calls begin() with the time execute() took.
+    """
+
+    statement = None  # The statement whose rows are being fetched
+    elapsed = 0.0
+    rows = 0
+
+    def begin(self, statement, elapsed):
+        self.finish()  # The cursor is being reused: close the books on the last statement
+        self.statement, self.elapsed, self.rows = statement, elapsed, 0
+
+    def timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.elapsed += time.perf_counter() - started
+
+    def fetchone(self):
+        row = self.timed(super().fetchone)
+        if row is None:
+            self.finish()
+        else:
+            self.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self.timed(super().fetchmany, size)
+        self.rows += len(rows)
+        if len(rows) < size:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self.timed(super().fetchall)
+        self.rows += len(rows)
+        self.finish()
+        return rows
+
+    def finish(self):
+        if self.statement is not None:
+            statement, self.statement = self.statement, None
+            record_query(statement, self.elapsed * 1000, self.rows)
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    __del__ = finish  # Dropped before all rows were read, e.g. conn.execute(...).fetchone()
+
+
+class TimedCursor(FetchTimedCursor):
+    """FetchTimedCursor that also times execute() itself (no SQLAlchemy events to do it)"""
+
+    def execute(self, sql, parameters=()):
+        self.begin(sql, 0.0)
+        self.timed(super().execute, sql, parameters)
+        if self.description is None:  # INSERT/UPDATE/DELETE: nothing to fetch, done now
+            self.rows = self.rowcount
+            self.finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self.begin(sql, 0.0)
+        self.timed(super().executemany, sql, seq_of_parameters)
+        self.rows = self.rowcount
+        self.finish()
+        return self
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors (and conn.execute) are TimedCursors"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):  # The built-in shortcut would skip cursor() above
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class FetchTimedConnection(sqlite3.Connection):
+    """sqlite3 connection for SQLAlchemy: its cursors time their fetches"""
+
+    def cursor(self, factory=FetchTimedCursor):
+        return super().cursor(factory)
+
+
+# -----------------------------------------------------------------------------
+# SQLAlchemy engines
+# -----------------------------------------------------------------------------
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_started
+    if isinstance(cursor, FetchTimedCursor) and cursor.description is not None:
+        cursor.begin(statement, elapsed)  # SQLite SELECT: keep timing while the rows are fetched
+    else:
+        record_query(statement, elapsed * 1000, cursor.rowcount)  # Other drivers fetch every row in execute()
+
+
+def use_timed_cursors(dialect, connection_record, cargs, cparams):
+    """SQLite only: open every connection as a FetchTimedConnection"""
+    cparams['factory'] = FetchTimedConnection
+
+
+def time_engine(engine):
+    from sqlalchemy import event  # Imported here: parts 1 and 2 never load SQLAlchemy
+
+    event.listen(engine, 'before_cursor_execute', start_query_timer)
+    event.listen(engine, 'after_cursor_execute', stop_query_timer)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'do_connect', use_timed_cursors)
+
+
+# -----------------------------------------------------------------------------
+# The app side
+# -----------------------------------------------------------------------------
+
+def setup_slow_query_log(path):
+    """Write the slow-query log to `path` (None = the console); the first app to ask decides"""
+    if not slow_query_log.handlers:
+        handler = logging.FileHandler(path) if path else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s SLOW %(message)s'))
+        slow_query_log.addHandler(handler)
+        slow_query_log.propagate = False
+
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+def add_server_timing(response):
+    """DB time, statement count and total time of this request (streamed bodies not included)"""
+    total_ms = (time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000
+    response.headers['Server-Timing'] = (
+        f'db;dur={g.get("db_ms", 0.0):.2f};desc="{g.get("db_statements", 0)} statements, '
+        f'{g.get("db_rows", 0)} rows", app;dur={total_ms:.2f}'
+    )
+    return response
+
+
+def query_timings():
+    """Per-statement latency histograms since the app started"""
+    return jsonify(query_stats.snapshot())
+
+
+def init_app(app, engines=()):
+    """Slow-query log, Server-Timing header, GET /debug/queries and timing listeners on `engines`
+
+    Reads SLOW_QUERY_MS, SLOW_QUERY_LOG and EXPOSE_QUERY_STATS from app.config.
+    """
+    setup_slow_query_log(app.config['SLOW_QUERY_LOG'])
+    for engine in engines:
+        time_engine(engine)
+    app.before_request(start_request_timer)
+    app.after_request(add_server_timing)
+    if app.debug or app.config['EXPOSE_QUERY_STATS']:
+        app.add_url_rule('/debug/queries', 'query_timings', query_timings)
@@ -12,28 +12,85 @@ What You'll Learn:
 Prerequisites: You should know Flask basics (routes, templates, render_template)
 """
 
-from flask import Flask, render_template
+import os
 import sqlite3  # Built-in Python library for SQLite database
+import sys
 
-app = Flask(__name__)
+import click
+from flask import Blueprint, Flask, current_app, render_template, g
 
-DATABASE = 'students.db'  # Database file name (will be created automatically)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for dbtools/
+from dbtools import pool, serve, sqlite, timing  # noqa: E402
+
+bp = Blueprint('main', __name__, cli_group=None)  # Routes and commands; create_app() attaches them to an app
+
+
+# =============================================================================
+# APPLICATION FACTORY
+# =============================================================================
+# Instead of one global `app`, create_app() builds a new, fully set-up app
+# every time it is called. Importing this file only defines things (quick for
+# workers that start often), tests can build apps with their own settings,
+# and `flask --app app run` finds create_app() by itself.
+#
+# The table is created by `flask --app app init-db` (or `python app.py`),
+# not every time a server starts.
+
+def create_app(config=None):
+    """Build the app; `config` overrides the defaults below, e.g. {'DATABASE': 'test.db'}"""
+    app = Flask(__name__)
+    app.config['DATABASE'] = 'students.db'  # Database file name (will be created automatically)
+    app.config['DB_POOL_SIZE'] = 5  # Idle connections kept open between requests (0 = no reuse)
+    app.config['SQLITE_PRAGMAS'] = dict(sqlite.PRAGMAS)  # WAL, bigger cache, mmap: see dbtools/sqlite.py ({} = SQLite defaults)
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '100'))  # Statements slower than this go to the slow-query log
+    app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG')  # Slow-query log file (None = print to the console)
+    app.config['EXPOSE_QUERY_STATS'] = os.getenv('EXPOSE_QUERY_STATS') == '1'  # GET /debug/queries outside debug mode (shows raw SQL)
+    app.config.update(config or {})
+
+    timing.init_app(app)
+    app.extensions['db_pool'] = pool.ConnectionPool(connect_db)  # Each app has its own pool (see get_db_connection)
+    app.teardown_appcontext(release_db_connection)
+    app.register_blueprint(bp)
+    return app
+
+
+# =============================================================================
+# QUERY TIMING
+# =============================================================================
+# Every statement is timed by dbtools/timing.py: GET /debug/queries, the
+# slow-query log (SLOW_QUERY_MS) and a Server-Timing header on every response.
 
 
 # =============================================================================
 # DATABASE HELPER FUNCTIONS
 # =============================================================================
 
-def get_db_connection():
-    """Create a connection to the database"""
-    conn = sqlite3.connect(DATABASE)  # Connect to database file
+def connect_db():
+    """Open a brand-new connection to the database file"""
+    conn = sqlite3.connect(current_app.config['DATABASE'], check_same_thread=False,  # The pool passes it between threads
+                           factory=timing.TimedConnection)  # Time every statement (see QUERY TIMING)
     conn.row_factory = sqlite3.Row  # This allows accessing columns by name (like dict)
+    sqlite.apply_pragmas(conn, current_app.config['SQLITE_PRAGMAS'])  # Tune this connection (see SQLITE_PRAGMAS above)
     return conn
 
 
+def get_db_connection():
+    """Get this request's connection (borrowed from the app's pool on first use)"""
+    if 'db' not in g:  # g lives for one request, so each request has its own connection
+        g.db = current_app.extensions['db_pool'].checkout()
+    return g.db
+
+
+def release_db_connection(exception):
+    """Runs after every request (registered in create_app): return the connection to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        current_app.extensions['db_pool'].checkin(conn, current_app.config['DB_POOL_SIZE'])
+
+
 def init_db():
-    """Create the table if it doesn't exist"""
-    conn = get_db_connection()
+    """Create the table if it doesn't exist (needs an app context)"""
+    conn = connect_db()  # Runs before any request, so use a plain connection
     conn.execute('''
         CREATE TABLE IF NOT EXISTS students (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -42,24 +99,32 @@ def init_db():
             course TEXT NOT NULL
         )
     ''')  # SQL command to create table with 4 columns
+    # An index lets SQLite find students by name without reading every row
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_name ON students (name)')
     conn.commit()  # Save changes to database
     conn.close()  # Close connection
 
 
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the table (run once before serving)"""
+    init_db()
+    click.echo('Database initialized!')
+
+
 # =============================================================================
 # ROUTES
 # =============================================================================
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Home page - Display all students from database"""
-    conn = get_db_connection()  # Step 1: Connect to database
+    conn = get_db_connection()  # Step 1: Get a connection (returned to the pool after the request)
     students = conn.execute('SELECT * FROM students').fetchall()  # Step 2: Get all rows
-    conn.close()  # Step 3: Close connection
     return render_template('index.html', students=students)
 
 
-@app.route('/add')
+@bp.route('/add')
 def add_sample_student():
     """Add a sample student to database (for testing)"""
     conn = get_db_connection()
@@ -68,13 +133,30 @@ def add_sample_student():
         ('John Doe', 'john@example.com', 'Python')  # ? are placeholders (safe from SQL injection)
     )
     conn.commit()  # Don't forget to commit!
-    conn.close()
     return 'Student added! <a href="/">Go back to home</a>'
 
 
+# =============================================================================
+# PRODUCTION SERVER (flask --app app serve)
+# =============================================================================
+# dbtools/serve.py runs the app under gunicorn: several worker processes, all
+# forked from this one. A forked worker inherits the parent's open database
+# connections, so reset_after_fork() drops them: two processes must never
+# share one.
+
+def reset_after_fork(app):
+    """Runs in every new worker process (gunicorn's post_fork hook)"""
+    app.extensions['db_pool'].forget()  # The parent's sqlite3 connections stay with the parent
+
+
+bp.cli.add_command(serve.make_command(reset_after_fork))
+
+
 if __name__ == '__main__':
-    init_db()  # Create table when app starts
-    app.run(debug=True)
+    app = create_app({'DEBUG': True})  # Debug mode also serves /debug/queries
+    with app.app_context():
+        init_db()  # Create table when app starts
+    app.run()
 
 
 # =============================================================================
@@ -87,6 +169,8 @@ if __name__ == '__main__':
 #
 # 2. Connection Flow:
 #    connect → execute SQL → commit (if changing data) → close
+#    Opening a connection is slow, so this app reuses them with a small pool:
+#    get_db_connection() borrows one per request and teardown gives it back.
 #
 # 3. SQL Commands Used:
 #    - CREATE TABLE: Define table structure
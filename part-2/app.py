@@ -13,23 +13,88 @@ What You'll Learn:
 Prerequisites: Complete part-1 first
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash
+import os
 import sqlite3
+import sys
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-here'  # Required for flash messages
+import click
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, flash, g
 
-DATABASE = 'students.db'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for dbtools/
+from dbtools import pool, serve, sqlite, templates, timing  # noqa: E402
 
+bp = Blueprint('main', __name__, cli_group=None)  # Routes and commands; create_app() attaches them to an app
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
+
+# =============================================================================
+# APPLICATION FACTORY
+# =============================================================================
+# create_app() builds a new app every time it is called (see part-1). Routes
+# live on the blueprint `bp`, so their endpoint names get its prefix:
+# url_for('main.index') instead of url_for('index').
+
+def create_app(config=None):
+    """Build the app; `config` overrides the defaults below"""
+    app = Flask(__name__)
+    app.secret_key = 'your-secret-key-here'  # Required for flash messages
+
+    app.config['DATABASE'] = 'students.db'
+    app.config['DB_POOL_SIZE'] = 5  # Idle connections kept open between requests (0 = no reuse)
+    app.config['PAGE_SIZE'] = 50  # Students on the home page (and per "Load more")
+    app.config['TEMPLATE_CACHE_DIR'] = os.path.join(app.instance_path, 'jinja_cache')  # Compiled templates (None = off)
+    app.config['SQLITE_PRAGMAS'] = dict(sqlite.PRAGMAS)  # WAL, bigger cache, mmap: see dbtools/sqlite.py ({} = SQLite defaults)
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '100'))  # Statements slower than this go to the slow-query log
+    app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG')  # Slow-query log file (None = print to the console)
+    app.config['EXPOSE_QUERY_STATS'] = os.getenv('EXPOSE_QUERY_STATS') == '1'  # GET /debug/queries outside debug mode (shows raw SQL)
+    app.config.update(config or {})
+
+    timing.init_app(app)
+    templates.init_app(app, fragments=False)
+    app.extensions['db_pool'] = pool.ConnectionPool(connect_db)
+    app.teardown_appcontext(release_db_connection)
+    app.register_blueprint(bp)
+    return app
+
+
+# =============================================================================
+# TEMPLATE CACHE
+# =============================================================================
+# Compiled templates are kept in TEMPLATE_CACHE_DIR, so a new worker process
+# loads them instead of compiling again (see dbtools/templates.py). part-3 also
+# caches rendered rows.
+
+bp.cli.add_command(templates.compile_templates_command)
+
+
+# =============================================================================
+# QUERY TIMING
+# =============================================================================
+# Every statement is timed by dbtools/timing.py: GET /debug/queries, the
+# slow-query log (SLOW_QUERY_MS) and a Server-Timing header on every response.
+
+
+def connect_db():
+    conn = sqlite3.connect(current_app.config['DATABASE'], check_same_thread=False,  # The pool passes it between threads
+                           factory=timing.TimedConnection)  # Time every statement (see QUERY TIMING)
     conn.row_factory = sqlite3.Row
+    sqlite.apply_pragmas(conn, current_app.config['SQLITE_PRAGMAS'])
     return conn
 
 
+def get_db_connection():
+    if 'db' not in g:  # One connection per request, borrowed on first use
+        g.db = current_app.extensions['db_pool'].checkout()
+    return g.db
+
+
+def release_db_connection(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        current_app.extensions['db_pool'].checkin(conn, current_app.config['DB_POOL_SIZE'])
+
+
 def init_db():
-    conn = get_db_connection()
+    conn = connect_db()
     conn.execute('''
         CREATE TABLE IF NOT EXISTS students (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -38,15 +103,23 @@ def init_db():
             course TEXT NOT NULL
         )
     ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_name ON students (name)')
     conn.commit()
     conn.close()
 
 
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the table (run once before serving)"""
+    init_db()
+    click.echo('Database initialized!')
+
+
 # =============================================================================
 # CREATE - Add new student
 # =============================================================================
 
-@app.route('/add', methods=['GET', 'POST'])  # Allow both GET and POST
+@bp.route('/add', methods=['GET', 'POST'])  # Allow both GET and POST
 def add_student():
     if request.method == 'POST':  # Form was submitted
         name = request.form['name']  # Get data from form field named 'name'
@@ -59,31 +132,57 @@ def add_student():
             (name, email, course)
         )
         conn.commit()
-        conn.close()
 
         flash('Student added successfully!', 'success')  # Show success message
-        return redirect(url_for('index'))  # Go back to home page
+        return redirect(url_for('main.index'))  # Go back to home page
 
     return render_template('add.html')  # GET request: show empty form
 
 
 # =============================================================================
-# READ - Display all students
+# READ - Display students, one page at a time
 # =============================================================================
+# Rendering every student makes the page slower (and heavier) with every row
+# added. The page shows PAGE_SIZE students and a "Load more" link that
+# remembers the last id shown (keyset pagination):
+#     SELECT * FROM students WHERE id < 4951 ORDER BY id DESC LIMIT 51
+# walks the primary key from that id on, so page 1000 is as fast as page 1.
+# (LIMIT 50 OFFSET 49950 would read and throw away 49950 rows first.)
+#
+# GET /?after=<id>               - The whole page, starting after that student (works without JavaScript)
+# GET /students/rows?after=<id>  - Only the next rows (<tr>s): the script in index.html
+#                                  appends them when "Load more" is clicked or scrolled into view
 
-@app.route('/')
-def index():
+def student_page(after=None):
+    """PAGE_SIZE students, newest first, after id `after`; returns (students, `after` for the next page)"""
+    size = current_app.config['PAGE_SIZE']
     conn = get_db_connection()
-    students = conn.execute('SELECT * FROM students ORDER BY id DESC').fetchall()  # Newest first
-    conn.close()
-    return render_template('index.html', students=students)
+    if after is None:
+        rows = conn.execute('SELECT * FROM students ORDER BY id DESC LIMIT ?', (size + 1,)).fetchall()
+    else:
+        rows = conn.execute('SELECT * FROM students WHERE id < ? ORDER BY id DESC LIMIT ?',
+                            (after, size + 1)).fetchall()
+    next_after = rows[size - 1]['id'] if len(rows) > size else None  # The extra row: there is another page
+    return rows[:size], next_after
+
+
+@bp.route('/')
+def index():
+    students, next_after = student_page(request.args.get('after', type=int))
+    return render_template('index.html', students=students, next_after=next_after)
+
+
+@bp.route('/students/rows')
+def student_rows():
+    students, next_after = student_page(request.args.get('after', type=int))
+    return render_template('student_rows.html', students=students, next_after=next_after)
 
 
 # =============================================================================
 # UPDATE - Edit existing student
 # =============================================================================
 
-@app.route('/edit/<int:id>', methods=['GET', 'POST'])
+@bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 def edit_student(id):
     conn = get_db_connection()
 
@@ -97,14 +196,12 @@ def edit_student(id):
             (name, email, course, id)  # Update WHERE id matches
         )
         conn.commit()
-        conn.close()
 
         flash('Student updated successfully!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     # GET request: fetch current data and show in form
     student = conn.execute('SELECT * FROM students WHERE id = ?', (id,)).fetchone()
-    conn.close()
     return render_template('edit.html', student=student)
 
 
@@ -112,20 +209,37 @@ def edit_student(id):
 # DELETE - Remove student
 # =============================================================================
 
-@app.route('/delete/<int:id>')
+@bp.route('/delete/<int:id>')
 def delete_student(id):
     conn = get_db_connection()
     conn.execute('DELETE FROM students WHERE id = ?', (id,))  # Remove row
     conn.commit()
-    conn.close()
 
     flash('Student deleted!', 'danger')  # Show delete message
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
+
+
+# =============================================================================
+# PRODUCTION SERVER (flask --app app serve)
+# =============================================================================
+# dbtools/serve.py runs the app under gunicorn: several worker processes, all
+# forked from this one. A forked worker inherits the parent's open database
+# connections, so reset_after_fork() drops them: two processes must never
+# share one.
+
+def reset_after_fork(app):
+    """Runs in every new worker process (gunicorn's post_fork hook)"""
+    app.extensions['db_pool'].forget()  # The parent's sqlite3 connections stay with the parent
+
+
+bp.cli.add_command(serve.make_command(reset_after_fork, prepare=templates.compile_templates))  # Templates are compiled once, before forking
 
 
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True)
+    app = create_app({'DEBUG': True})  # Debug mode also serves /debug/queries
+    with app.app_context():
+        init_db()
+    app.run()
 
 
 # =============================================================================
@@ -150,8 +264,9 @@ if __name__ == '__main__':
 # 2. request.form['field_name']
 #    - Gets the value from HTML form input with that name
 #   
-# 3. redirect(url_for('function_name'))
+# 3. redirect(url_for('main.function_name'))
 #    - Sends user to another page after action completes
+#    - 'main.' is the blueprint the routes are registered on (see create_app)
 #
 # 4. flash('message', 'category')
 #    - Shows one-time message to user
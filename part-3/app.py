@@ -13,19 +13,80 @@ Prerequisites: Complete part-1 and part-2
 Install: pip install flask-sqlalchemy
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash
+import os
+import sys
+from datetime import datetime
+
+import click
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, flash
 from flask_sqlalchemy import SQLAlchemy  # Import SQLAlchemy
+from sqlalchemy import func, inspect, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for dbtools/
+from dbtools import bulk_load, serve, sqlite, templates, timing  # noqa: E402
+from dbtools.serializers import Serializer  # noqa: E402
+
+db = SQLAlchemy()  # Not tied to an app yet: create_app() calls db.init_app(app)
+bp = Blueprint('main', __name__, cli_group=None)  # Routes and commands; create_app() attaches them to an app
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key'
 
 # =============================================================================
-# DATABASE CONFIGURATION
+# APPLICATION FACTORY
 # =============================================================================
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///school.db'  # Database file
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # Disable warning
+# create_app() builds a new app every time it is called (see part-1). Models
+# and routes are defined once, below, on `db` and the blueprint `bp`;
+# create_app() connects them to the app it builds.
+#
+# The tables are created by `flask --app app init-db` (or `python app.py`),
+# not every time a server starts (see MIGRATIONS).
+
+def create_app(config=None):
+    """Build the app; `config` overrides the defaults below, e.g. {'SQLALCHEMY_DATABASE_URI': ...}"""
+    app = Flask(__name__)
+    app.secret_key = 'your-secret-key'
+
+    # DATABASE CONFIGURATION
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///school.db'  # Database file
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # Disable warning
+    app.config['PAGE_SIZE'] = 50  # Students on the home page (and per "Load more")
+    app.config['TEMPLATE_CACHE_DIR'] = os.path.join(app.instance_path, 'jinja_cache')  # Compiled templates (None = off)
+    app.config['FRAGMENT_CACHE_TTL'] = 300  # Seconds a {% cache %} fragment is served before it is rendered again
+    app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = 10000  # Least recently used fragments go first
+    app.config['EXPOSE_FRAGMENT_CACHE_STATS'] = os.getenv('EXPOSE_FRAGMENT_CACHE_STATS') == '1'  # GET /debug/fragment-cache outside debug mode
+    app.config['SQLITE_PRAGMAS'] = dict(sqlite.PRAGMAS)  # WAL, bigger cache, mmap: see dbtools/sqlite.py ({} = SQLite defaults)
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '100'))  # Statements slower than this go to the slow-query log
+    app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG')  # Slow-query log file (None = print to the console)
+    app.config['EXPOSE_QUERY_STATS'] = os.getenv('EXPOSE_QUERY_STATS') == '1'  # GET /debug/queries outside debug mode (shows raw SQL)
+    app.config.update(config or {})
+
+    db.init_app(app)  # Initialize SQLAlchemy with app
+    with app.app_context():
+        sqlite.tune_engine(db.engine, app.config)
+        timing.init_app(app, [db.engine])
+    templates.init_app(app)
+    if click.get_current_context(silent=True):  # Started by the `flask` command: add `flask db ...`
+        setup_migrations(app)
+    app.register_blueprint(bp)
+    return app
+
 
-db = SQLAlchemy(app)  # Initialize SQLAlchemy with app
+# =============================================================================
+# QUERY TIMING
+# =============================================================================
+# Every statement is timed by dbtools/timing.py: GET /debug/queries, the
+# slow-query log (SLOW_QUERY_MS) and a Server-Timing header on every response.
+
+
+# =============================================================================
+# TEMPLATE CACHING
+# =============================================================================
+# Two caches make HTML pages cheaper (see dbtools/templates.py):
+#   - compiled templates are kept in TEMPLATE_CACHE_DIR for new worker processes
+#   - {% cache key %} ... {% endcache %} keeps rendered HTML, e.g. one table row
+#     per key in student_rows.html; GET /debug/fragment-cache shows hits and misses
+#     (debug mode or EXPOSE_FRAGMENT_CACHE_STATS=1)
+
+bp.cli.add_command(templates.compile_templates_command)
 
 
 # =============================================================================
@@ -36,6 +97,7 @@ class Course(db.Model):  # Course table
     id = db.Column(db.Integer, primary_key=True)  # Auto-increment ID
     name = db.Column(db.String(100), nullable=False)  # Course name
     description = db.Column(db.Text)  # Optional description
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Row version for {% cache %}
 
     # Relationship: One Course has Many Students
     students = db.relationship('Student', backref='course', lazy=True)
@@ -50,7 +112,9 @@ class Student(db.Model):  # Student table
     email = db.Column(db.String(120), unique=True, nullable=False)  # unique=True means no duplicates
 
     # Foreign Key: Links student to a course
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    # index=True: "students of course X" (joins and counts) is a lookup, not a full scan
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Row version for {% cache %}
 
     def __repr__(self):
         return f'<Student {self.name}>'
@@ -60,21 +124,70 @@ class Student(db.Model):  # Student table
 # ROUTES - Using ORM instead of raw SQL
 # =============================================================================
 
-@app.route('/')
+@bp.route('/')
 def index():
     # OLD WAY (raw SQL): conn.execute('SELECT * FROM students').fetchall()
-    # NEW WAY (ORM):
-    students = Student.query.all()  # Get all students
-    return render_template('index.html', students=students)
+    # NEW WAY (ORM): Student.query.all() - but see student_page(): one page at a time
+    students, next_after = student_page(request.args.get('after', type=int))
+    return render_template('index.html', students=students, next_after=next_after)
 
 
-@app.route('/courses')
+# One page at a time: rendering every student gets slower (and heavier) with
+# every row added. The page shows PAGE_SIZE students and a "Load more" link
+# that remembers the last id shown (keyset pagination):
+#     ... WHERE student.id > 50 ORDER BY student.id LIMIT 51
+# walks the primary key from there, so page 1000 is as fast as page 1.
+#
+# GET /?after=<id>               - The whole page, starting after that student (works without JavaScript)
+# GET /students/rows?after=<id>  - Only the next rows (<tr>s): the script in index.html
+#                                  appends them when "Load more" is clicked or scrolled into view
+
+# The rows are read-only, so the page selects just the columns it shows (the
+# course name comes from a JOIN: one query, no N+1) into slotted records
+# instead of loading Student objects (see dbtools/serializers.py). The
+# template reads them the same way: student.name, student.course_name.
+student_serializer = Serializer(
+    'Student',
+    id=Student.id,
+    name=Student.name,
+    email=Student.email,
+    course_name=Course.name,
+    updated_at=Student.updated_at,  # Row version, for the fragment cache key
+)
+
+
+def student_page(after=None):
+    """PAGE_SIZE students in id order, after id `after`; returns (students, `after` for the next page)"""
+    size = current_app.config['PAGE_SIZE']
+    record_type = student_serializer.record_type()
+    query = select(*record_type.columns).select_from(Student).join(Course).order_by(Student.id)
+    if after is not None:
+        query = query.filter(Student.id > after)
+    rows = db.session.execute(query.limit(size + 1)).all()  # One extra row tells us if there is another page
+    next_after = rows[size - 1].id if len(rows) > size else None
+    return [record_type.record(row) for row in rows[:size]], next_after
+
+
+@bp.route('/students/rows')
+def student_rows():
+    students, next_after = student_page(request.args.get('after', type=int))
+    return render_template('student_rows.html', students=students, next_after=next_after)
+
+
+@bp.route('/courses')
 def courses():
-    all_courses = Course.query.all()  # Get all courses
+    # Let the database count students per course (a COUNT subquery) instead of
+    # loading every student of every course just to call len() on the list
+    student_count = (
+        select(func.count(Student.id))
+        .where(Student.course_id == Course.id)
+        .scalar_subquery()
+    )
+    all_courses = db.session.query(Course, student_count.label('student_count')).all()  # (course, count) pairs
     return render_template('courses.html', courses=all_courses)
 
 
-@app.route('/add', methods=['GET', 'POST'])
+@bp.route('/add', methods=['GET', 'POST'])
 def add_student():
     if request.method == 'POST':
         name = request.form['name']
@@ -88,13 +201,13 @@ def add_student():
         db.session.commit()  # Save to database
 
         flash('Student added successfully!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     courses = Course.query.all()  # Get courses for dropdown
     return render_template('add.html', courses=courses)
 
 
-@app.route('/edit/<int:id>', methods=['GET', 'POST'])
+@bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 def edit_student(id):
     # OLD WAY: conn.execute('SELECT * FROM students WHERE id = ?', (id,))
     # NEW WAY:
@@ -107,23 +220,23 @@ def edit_student(id):
 
         db.session.commit()  # Save changes
         flash('Student updated!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     courses = Course.query.all()
     return render_template('edit.html', student=student, courses=courses)
 
 
-@app.route('/delete/<int:id>')
+@bp.route('/delete/<int:id>')
 def delete_student(id):
     student = Student.query.get_or_404(id)
     db.session.delete(student)  # Delete the object
     db.session.commit()
 
     flash('Student deleted!', 'danger')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
-@app.route('/add-course', methods=['GET', 'POST'])
+@bp.route('/add-course', methods=['GET', 'POST'])
 def add_course():
     if request.method == 'POST':
         name = request.form['name']
@@ -134,35 +247,144 @@ def add_course():
         db.session.commit()
 
         flash('Course added!', 'success')
-        return redirect(url_for('courses'))
+        return redirect(url_for('main.courses'))
 
     return render_template('add_course.html')
 
 
+# =============================================================================
+# BULK LOADER (flask load / flask seed)
+# =============================================================================
+# Creating one ORM object per row is slow and keeps every object in memory.
+# dbtools/bulk_load.py streams the rows in batches instead (COPY on PostgreSQL,
+# executemany elsewhere), all in one transaction.
+#
+#   flask --app app load students.csv --model student --batch-size 5000
+#   flask --app app seed --rows 100000
+
+LOADABLE_MODELS = {'student': Student, 'course': Course}
+
+
+@bp.cli.command('load')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--model', type=click.Choice(list(LOADABLE_MODELS)), default='student', show_default=True)
+@click.option('--batch-size', default=5000, show_default=True, help='Rows sent per executemany/COPY')
+def load_command(path, model, batch_size):
+    """Bulk-load rows from a CSV or NDJSON file"""
+    table = LOADABLE_MODELS[model].__table__
+    upgrade_db()
+    bulk_load.load_and_report(db.engine, table, bulk_load.read_rows(path), batch_size)
+
+
+@bp.cli.command('seed')
+@click.option('--rows', default=10000, show_default=True)
+@click.option('--batch-size', default=5000, show_default=True)
+def seed_command(rows, batch_size):
+    """Insert generated sample students (for trying things at scale)"""
+    init_db()  # Creates the tables and the sample courses students belong to
+    course_ids = [course.id for course in Course.query.all()]
+    start = db.session.query(func.max(Student.id)).scalar() or 0  # Keeps emails unique across runs
+    students = (
+        {'name': f'Student {n}', 'email': f'student{n}@example.com', 'course_id': course_ids[n % len(course_ids)]}
+        for n in range(start + 1, start + rows + 1)
+    )
+    bulk_load.load_and_report(db.engine, Student.__table__, students, batch_size)
+
+
+# =============================================================================
+# MIGRATIONS (flask --app app db ...)
+# =============================================================================
+# db.create_all() only creates tables that are missing. It never adds a column
+# or an index to a table that already exists, so a model change (like the
+# index on Student.course_id) never reaches an existing database.
+#
+# Migrations do: every schema change is a numbered script in
+# migrations/versions/ (Alembic, through Flask-Migrate), and the database
+# remembers the last script it ran (table alembic_version).
+#
+#   flask --app app db migrate -m "add teacher"   # Write the next script from your model changes
+#   flask --app app db upgrade                    # Run the scripts this database hasn't run yet
+#   flask --app app db downgrade                  # Undo the last one
+#
+# init-db runs `upgrade` for you. A database made by db.create_all() (before
+# there were migrations) is first marked as being at BASELINE_REVISION.
+#
+# Alembic is only imported when a migration runs (or for `flask ...`
+# commands), so a server starting up doesn't pay for it.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+BASELINE_REVISION = '0001'  # The tables db.create_all() used to create
+
+
+def setup_migrations(app):
+    """Register Flask-Migrate on `app` (the `flask db ...` commands need it)"""
+    from flask_migrate import Migrate
+
+    if 'migrate' not in app.extensions:
+        Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)  # Batch mode: SQLite can't ALTER most things
+
+
+def upgrade_db():
+    """Run the migrations this database hasn't run yet (needs an app context)"""
+    from flask_migrate import stamp, upgrade
+
+    setup_migrations(current_app)
+    tables = inspect(db.engine).get_table_names()
+    if tables and 'alembic_version' not in tables:  # Created by db.create_all()
+        stamp(revision=BASELINE_REVISION)
+    upgrade()
+
+
 # =============================================================================
 # CREATE TABLES AND ADD SAMPLE DATA
 # =============================================================================
 
 def init_db():
-    """Create tables and add sample courses if empty"""
+    """Create tables and add sample courses if empty (needs an app context)"""
+    upgrade_db()  # Create (or update) the tables, see MIGRATIONS above
+
+    # Add sample courses if none exist
+    if Course.query.count() == 0:
+        sample_courses = [
+            Course(name='Python Basics', description='Learn Python programming fundamentals'),
+            Course(name='Web Development', description='HTML, CSS, JavaScript and Flask'),
+            Course(name='Data Science', description='Data analysis with Python'),
+        ]
+        db.session.add_all(sample_courses)  # Add multiple at once
+        db.session.commit()
+        print('Sample courses added!')
+
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the tables and sample courses (run once before serving)"""
+    init_db()
+    click.echo('Database initialized!')
+
+
+# =============================================================================
+# PRODUCTION SERVER (flask --app app serve)
+# =============================================================================
+# dbtools/serve.py runs the app under gunicorn: several worker processes, all
+# forked from this one. A forked worker inherits the parent's open database
+# connections, so reset_after_fork() drops them: two processes must never
+# share one.
+
+def reset_after_fork(app):
+    """Runs in every new worker process (gunicorn's post_fork hook)"""
     with app.app_context():
-        db.create_all()  # Create all tables based on models
+        for engine in db.engines.values():
+            engine.dispose(close=False)  # Forget the parent's pooled connections (closing them would close the parent's)
+
 
-        # Add sample courses if none exist
-        if Course.query.count() == 0:
-            sample_courses = [
-                Course(name='Python Basics', description='Learn Python programming fundamentals'),
-                Course(name='Web Development', description='HTML, CSS, JavaScript and Flask'),
-                Course(name='Data Science', description='Data analysis with Python'),
-            ]
-            db.session.add_all(sample_courses)  # Add multiple at once
-            db.session.commit()
-            print('Sample courses added!')
+bp.cli.add_command(serve.make_command(reset_after_fork, prepare=templates.compile_templates))  # Templates are compiled once, before forking
 
 
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True)
+    app = create_app({'DEBUG': True})  # Debug mode also serves /debug/queries
+    with app.app_context():
+        init_db()
+    app.run()
 
 
 # =============================================================================
@@ -0,0 +1,40 @@
+"""index student.course_id (built online)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 06:52:10.118274
+
+A plain CREATE INDEX blocks every write to the table until the index is
+built. On PostgreSQL, CREATE INDEX CONCURRENTLY builds it while inserts and
+updates go on. It can't run inside a transaction, hence autocommit_block().
+Other databases ignore postgresql_concurrently and build it the normal way.
+
+If a concurrent build fails, PostgreSQL leaves an INVALID index behind:
+DROP INDEX ix_student_course_id; then run `flask db upgrade` again.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def index_exists(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if index_exists('student', 'ix_student_course_id'):
+        return  # Already made by db.create_all() before this database used migrations
+    with op.get_context().autocommit_block():
+        op.create_index('ix_student_course_id', 'student', ['course_id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_student_course_id', table_name='student', postgresql_concurrently=True)
@@ -0,0 +1,34 @@
+"""add course.updated_at and student.updated_at (row versions)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:12:47.503816
+
+The templates put updated_at into their {% cache %} keys. Adding a nullable
+column is instant (no table rewrite) and nothing is backfilled: NULL is a
+version too, and the first edit of a row sets it.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+TABLES = ('course', 'student')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -13,15 +13,252 @@ What You'll Learn:
 Prerequisites: Complete part-3 (SQLAlchemy)
 """
 
-from flask import Flask, request, jsonify
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+import click
+from collections import OrderedDict
+from urllib.parse import urlencode
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import (and_, or_, false, func, inspect, literal_column, select, text, column, table, insert,
+                        update, delete)
+from sqlalchemy.exc import OperationalError
+from werkzeug.local import LocalProxy
+from datetime import datetime, timezone
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///api_demo.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for dbtools/
+from dbtools import bulk_load, prometheus, serve, sqlite, timing  # noqa: E402
+from dbtools.cursors import CursorError, decode_cursor, encode_cursor  # noqa: E402
+from dbtools.serializers import FieldsError, Serializer, iso_datetime  # noqa: E402
 
-db = SQLAlchemy(app)
+db = SQLAlchemy()  # Not tied to an app yet: create_app() calls db.init_app(app)
+bp = Blueprint('main', __name__, cli_group=None)  # Routes and commands; create_app() attaches them to an app
+
+
+# =============================================================================
+# APPLICATION FACTORY
+# =============================================================================
+# create_app() builds a new app every time it is called (see part-1). Models
+# and routes are defined once, below, on `db` and the blueprint `bp`;
+# create_app() connects them to the app it builds.
+#
+# The tables and the search index are created by `flask --app app init-db`
+# (or `python app.py`), not every time a server starts (see MIGRATIONS).
+
+def create_app(config=None):
+    """Build the app; `config` overrides the defaults below, e.g. {'SQLALCHEMY_DATABASE_URI': ...}"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///api_demo.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DEFAULT_PAGE_SIZE'] = 20  # Books per page when ?limit= is not given
+    app.config['MAX_PAGE_SIZE'] = 100  # Largest ?limit= a client may ask for
+    app.config['STREAM_BATCH_SIZE'] = 1000  # Rows fetched (and sent) per chunk when streaming
+    app.config['SEARCH_BACKEND'] = 'auto'  # 'auto', 'sqlite_fts', 'postgres_fts' or 'like'
+    app.config['BULK_BATCH_SIZE'] = 1000  # Rows written (and committed) per transaction in /api/books/bulk
+    app.config['BULK_MAX_ITEMS'] = 100000  # Largest number of books accepted in one bulk request
+    app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')  # 'memory', 'redis', 'redis-local' or 'none'
+    app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    app.config['CACHE_TTL'] = 60  # Seconds a cached response may be served
+    app.config['CACHE_MAX_ENTRIES'] = 1024  # In-memory backend only: least recently used entries go first
+    app.config['SQLITE_PRAGMAS'] = dict(sqlite.PRAGMAS)  # WAL, bigger cache, mmap: see dbtools/sqlite.py ({} = SQLite defaults)
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '100'))  # Statements slower than this go to the slow-query log
+    app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG')  # Slow-query log file (None = print to the console)
+    app.config['EXPOSE_QUERY_STATS'] = os.getenv('EXPOSE_QUERY_STATS') == '1'  # GET /debug/queries outside debug mode (shows raw SQL)
+    app.config['METRICS_DIR'] = os.getenv('METRICS_DIR')  # Folder shared by worker processes for /metrics (None = one process)
+    app.config['EXPOSE_METRICS'] = os.getenv('EXPOSE_METRICS') == '1'  # GET /metrics outside debug mode (for Prometheus)
+    app.config['JSON_PROVIDER'] = os.getenv('JSON_PROVIDER', 'auto')  # 'auto' (orjson if installed), 'orjson' or 'stdlib'
+    app.config['COMPRESS_ALGORITHMS'] = ['zstd', 'br', 'gzip']  # Preferred first; not installed = skipped ([] = off)
+    app.config['COMPRESS_LEVELS'] = {'zstd': 3, 'br': 4, 'gzip': 6}  # Fast levels: they run on every response
+    app.config['COMPRESS_MIN_SIZE'] = 1024  # Bytes; smaller bodies gain next to nothing from compression
+    app.config['COMPRESS_MIMETYPES'] = ['application/json', 'application/x-ndjson', 'text/html', 'text/plain']
+    app.config.update(config or {})
+
+    setup_json_provider(app)
+    setup_compression(app)
+    db.init_app(app)
+    with app.app_context():
+        sqlite.tune_engine(db.engine, app.config)
+        timing.init_app(app, [db.engine])
+        prometheus.init_app(app, {'primary': db.engine})
+        detect_search_backend(app)  # One look at the schema, instead of one per search
+    if click.get_current_context(silent=True):  # Started by the `flask` command: add `flask db ...`
+        setup_migrations(app)
+    app.extensions['response_cache'] = make_cache(app.config)
+    app.register_blueprint(bp)
+    return app
+
+
+# =============================================================================
+# QUERY TIMING AND METRICS
+# =============================================================================
+# dbtools/timing.py times every statement: GET /debug/queries, the slow-query
+# log (SLOW_QUERY_MS) and a Server-Timing header on every response.
+# dbtools/prometheus.py serves request counts, latency per route and pool usage
+# at GET /metrics (set METRICS_DIR when running several workers).
+
+
+# =============================================================================
+# JSON ENCODING AND RESPONSE COMPRESSION
+# =============================================================================
+# jsonify() goes through app.json, the app's JSON provider. Flask's default
+# uses the json module; orjson (pip install orjson) encodes the same data
+# several times faster and is used when it is installed (JSON_PROVIDER = 'auto').
+# The JSON looks the same except for key order (orjson keeps the order of the
+# dict instead of sorting it).
+#
+# Responses are compressed when the client asks for it, e.g.
+#     Accept-Encoding: gzip, br, zstd
+# The first algorithm in COMPRESS_ALGORITHMS that the client accepts (and
+# whose library is installed) wins:
+#   zstd - pip install zstandard (fastest for the size it reaches)
+#   br   - pip install brotli (smallest at the same speed as gzip, browsers only send it over HTTPS)
+#   gzip - always available (zlib is part of Python)
+# Bodies under COMPRESS_MIN_SIZE bytes are sent as they are. Streamed exports
+# (?stream=) are compressed chunk by chunk, so they still start right away.
+# Benchmark: python benchmarks/bench_json.py
+
+class OrjsonProvider(DefaultJSONProvider):
+    """app.json backed by orjson; anything orjson doesn't know goes through Flask's default()"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson  # Optional dependency, only needed for this provider
+        self.orjson = orjson
+        # Flask sends dates as HTTP dates; PASSTHROUGH hands them to default() to keep that
+        self.options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.compact is False or (self.compact is None and app.debug):
+            self.options |= orjson.OPT_INDENT_2  # Readable in the browser while debugging, like Flask's
+
+    def dumps(self, obj, **kwargs):
+        return self.orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return self.orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = self.orjson.dumps(obj, default=self.default, option=self.options)  # bytes: no str round trip
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {  # JSON_PROVIDER options
+    'orjson': OrjsonProvider,
+    'stdlib': DefaultJSONProvider,
+}
+
+
+def setup_json_provider(app):
+    """Called by create_app(): pick app.json according to JSON_PROVIDER"""
+    name = app.config['JSON_PROVIDER']
+    if name == 'auto':
+        name = 'orjson' if importlib.util.find_spec('orjson') else 'stdlib'
+    app.json = JSON_PROVIDERS[name](app)
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: with gzip header and trailer
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        """Everything compressed so far, so the client can use it before the stream ends"""
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, level):
+        import brotli  # Optional dependency, only needed for this encoding
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level):
+        import zstandard  # Optional dependency, only needed for this encoding
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        self.flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(self.flush_block)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+ENCODERS = {'gzip': GzipEncoder, 'br': BrotliEncoder, 'zstd': ZstdEncoder}  # COMPRESS_ALGORITHMS options
+ENCODER_MODULES = {'br': 'brotli', 'zstd': 'zstandard'}  # gzip needs nothing extra
+
+
+def setup_compression(app):
+    """Called by create_app(): keep the COMPRESS_ALGORITHMS whose library is installed"""
+    app.extensions['encodings'] = [
+        name for name in app.config['COMPRESS_ALGORITHMS']
+        if name not in ENCODER_MODULES or importlib.util.find_spec(ENCODER_MODULES[name])
+    ]
+
+
+def choose_encoding(response):
+    """The encoding to send `response` with, or None to send it as it is"""
+    if (response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in current_app.config['COMPRESS_MIMETYPES']):
+        return None
+    response.vary.add('Accept-Encoding')  # Caches in between must keep one copy per encoding
+    if not response.is_streamed and response.content_length < current_app.config['COMPRESS_MIN_SIZE']:
+        return None
+    return request.accept_encodings.best_match(current_app.extensions['encodings'])
+
+
+def compressed_stream(chunks, encoder):
+    for chunk in chunks:
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+@bp.after_app_request
+def compress_response(response):
+    encoding = choose_encoding(response)
+    if encoding is None:
+        return response
+    encoder = ENCODERS[encoding](current_app.config['COMPRESS_LEVELS'][encoding])
+    if response.is_streamed:
+        response.response = compressed_stream(response.iter_encoded(), encoder)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(encoder.compress(response.get_data()) + encoder.finish())  # Also sets Content-Length
+    response.headers['Content-Encoding'] = encoding
+    return response
 
 
 # =============================================================================
@@ -29,42 +266,618 @@ db = SQLAlchemy(app)
 # =============================================================================
 
 class Book(db.Model):
+    __table_args__ = (  # Composite indexes matching the keyset sorts: (sort column, id)
+        db.Index('ix_book_created_at_id', 'created_at', 'id'),  # Default sort (also serves created_at alone)
+        db.Index('ix_book_title_id', 'title', 'id'),  # ?sort=title
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    author = db.Column(db.String(100), nullable=False)
-    year = db.Column(db.Integer)
+    author = db.Column(db.String(100), nullable=False, index=True)  # index=True: find rows without a full scan
+    year = db.Column(db.Integer, index=True)  # ?year= filter
     isbn = db.Column(db.String(20), unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # For ETag / Last-Modified
+    # The JSON of a book is declared by book_serializer (see SERIALIZERS)
+
+
+class TableVersion(db.Model):
+    """One row per table: bumped on every write, so "did anything change?" is one tiny lookup"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def books_changed():
+    """Call in every write to the book table, before db.session.commit()"""
+    bumped = db.session.execute(
+        update(TableVersion)
+        .where(TableVersion.name == 'book')
+        .values(version=TableVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if bumped.rowcount == 0:  # First write ever
+        db.session.add(TableVersion(name='book', version=1, updated_at=datetime.utcnow()))
+
+
+# =============================================================================
+# SERIALIZERS
+# =============================================================================
+# Listings select just the columns they need into slotted records instead of
+# loading ORM objects (see dbtools/serializers.py).
+#
+# Sparse fieldsets: ?fields=id,title returns (and selects) just those fields on
+# /api/books, /api/books/<id> and /api/books/search, streamed or not.
+# Benchmark (CPU and memory against ORM objects + to_dict()):
+#     python benchmarks/bench_serializers.py
+
+book_serializer = Serializer(
+    'Book',
+    id=Book.id,
+    title=Book.title,
+    author=Book.author,
+    year=Book.year,
+    isbn=Book.isbn,
+    created_at=(Book.created_at, iso_datetime),
+)
+
 
-    def to_dict(self):  # Convert model to dictionary for JSON response
-        return {
-            'id': self.id,
-            'title': self.title,
-            'author': self.author,
-            'year': self.year,
-            'isbn': self.isbn,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+def requested_fields():
+    """?fields=id,title -> ('id', 'title'); every field without ?fields=. Raises FieldsError."""
+    return book_serializer.fieldset(request.args.get('fields'))
+
+
+# =============================================================================
+# KEYSET (CURSOR) PAGINATION
+# =============================================================================
+# OFFSET pagination (LIMIT 10 OFFSET 100000) makes the database walk past every
+# skipped row, so deep pages get slower and slower. Keyset pagination remembers
+# the last row of the page instead ("continue after created_at=X, id=Y"), so
+# every page costs the same. The position is sent to the client as an opaque
+# base64 "cursor" string (dbtools/cursors.py, shared with async_app.py).
+
+SORT_COLUMNS = {  # ?sort= options (id breaks ties so the order is always stable)
+    'created_at': Book.created_at,
+    'id': Book.id,
+    'title': Book.title,
+}
+
+
+def paginate(query, fields, rank=None):
+    """Apply ?sort=&order=&limit=&cursor=&total= to a Book query.
+
+    Only the columns of `fields` (see requested_fields()) are selected.
+    `rank` is an optional relevance expression (smaller = better match) from
+    the search backend; it adds a 'relevance' sort and makes it the default.
+    Returns the JSON fields to merge into the response.
+    Raises CursorError for a bad cursor.
+    """
+    sort_columns = dict(SORT_COLUMNS)
+    default_sort = 'created_at'
+    if rank is not None:
+        sort_columns['relevance'] = rank
+        default_sort = 'relevance'
+
+    sort = request.args.get('sort', default_sort)
+    if sort not in sort_columns:
+        sort = default_sort
+    descending = request.args.get('order', 'asc') == 'desc'
+    limit = request.args.get('limit', current_app.config['DEFAULT_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+    column = sort_columns[sort]
+
+    # COUNT(*) scans the whole result, so only run it when the client asks
+    total = query.order_by(None).count() if request.args.get('total') == 'true' else None
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if descending:  # "rows that come after the last one we sent"
+            after = or_(column < value, and_(column == value, Book.id < last_id))
+        else:
+            after = or_(column > value, and_(column == value, Book.id > last_id))
+        query = query.filter(after)
+
+    if descending:
+        query = query.order_by(column.desc(), Book.id.desc())
+    else:
+        query = query.order_by(column.asc(), Book.id.asc())
+
+    # Only the requested columns, plus the sort value and id the cursor remembers (labelled, so
+    # they stay separate columns even when the same column was requested too)
+    record_type = book_serializer.record_type(fields)
+    query = query.with_entities(*record_type.columns, column.label('sort_value'), Book.id.label('cursor_id'))
+    rows = query.limit(limit + 1).all()  # One extra row tells us if there is another page
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    page = {
+        'count': len(rows),
+        'books': [record_type.dump(row) for row in rows],
+        'has_more': has_more,
+        'next_cursor': encode_cursor(sort, rows[-1].sort_value, rows[-1].cursor_id) if has_more else None,
+    }
+    if total is not None:
+        page['total'] = total
+    return page
+
+
+# =============================================================================
+# STREAMING RESPONSES
+# =============================================================================
+# jsonify() builds the whole list of books, then the whole JSON string, before
+# sending a single byte. For exports of every book we stream instead: rows are
+# fetched in batches (yield_per) and each batch is written out straight away,
+# so memory stays flat no matter how many books there are.
+#
+#   ?stream=ndjson  or  Accept: application/x-ndjson  -> one JSON book per line
+#   ?stream=json                                      -> {"success": true, "books": [...]}
+
+def stream_mode():
+    """Which streaming format the client asked for (None = normal JSON page)"""
+    mode = request.args.get('stream')
+    if mode in ('ndjson', 'json'):
+        return mode
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        return 'ndjson'
+    return None
+
+
+def stream_books(query, mode, fields):
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    record_type = book_serializer.record_type(fields)
+    # yield_per: fetch rows in batches (server-side cursor on PostgreSQL/MySQL)
+    query = query.with_entities(*record_type.columns).order_by(Book.id).yield_per(batch_size)
+
+    def generate():
+        if mode == 'json':
+            yield '{"success": true, "books": ['
+        chunk = []
+        first = True
+        for row in query:
+            text = current_app.json.dumps(record_type.dump(row))  # The app's JSON provider (orjson if installed)
+            if mode == 'json' and not first:
+                text = ',' + text
+            chunk.append(text + '\n' if mode == 'ndjson' else text)
+            first = False
+            if len(chunk) >= batch_size:
+                yield ''.join(chunk)
+                chunk = []
+        yield ''.join(chunk)
+        if mode == 'json':
+            yield ']}'
+
+    mimetype = 'application/x-ndjson' if mode == 'ndjson' else 'application/json'
+    # stream_with_context keeps the request (and DB session) alive while we stream
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+# =============================================================================
+# FULL-TEXT SEARCH
+# =============================================================================
+# Book.title.ilike('%python%') has a leading wildcard, so no index can help and
+# every search reads the whole table. A full-text index stores each word once
+# with the list of rows containing it, so a search only touches matching rows
+# and can rank them by relevance.
+#
+# Each backend has the same three methods:
+#   setup()                     - build the index (called from init_db)
+#   ready()                     - is the index there? (checked when the app is created, and after init_db)
+#   apply(query, title, author) - filter a Book query, return (query, rank or None)
+# A rank is an SQL expression where smaller = better match.
+
+def search_terms(text_value):
+    """'Flask web-dev!' -> ['Flask', 'web', 'dev'] (drops quotes and operators)"""
+    return re.findall(r'\w+', text_value)
+
+
+class LikeSearch:
+    """Works everywhere, but scans the whole table on every search"""
+
+    def setup(self):
+        pass
+
+    def ready(self):
+        return True
+
+    def apply(self, query, title, author):
+        if title:
+            query = query.filter(Book.title.ilike(f'%{title}%'))  # Case-insensitive LIKE
+        if author:
+            query = query.filter(Book.author.ilike(f'%{author}%'))
+        return query, None
+
+
+book_fts = table('book_fts', column('rowid'), column('book_fts'))  # Not a model: created by setup()
+
+SQLITE_FTS_SCHEMA = [
+    # External-content FTS5 table: stores only the index, the text stays in "book"
+    "CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5("
+    "title, author, content='book', content_rowid='id')",
+    # Triggers keep the index in sync with every INSERT / UPDATE / DELETE
+    "CREATE TRIGGER IF NOT EXISTS book_fts_insert AFTER INSERT ON book BEGIN "
+    "INSERT INTO book_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_delete AFTER DELETE ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author); END",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_update AFTER UPDATE ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO book_fts(rowid, title, author) VALUES (new.id, new.title, new.author); END",
+]
+
+
+class SqliteFtsSearch:
+    """SQLite FTS5 virtual table, ranked with bm25()"""
+
+    def setup(self):
+        exists = self.ready()
+        for statement in SQLITE_FTS_SCHEMA:
+            db.session.execute(text(statement))
+        if not exists:  # Index the books that were added before the FTS table existed
+            db.session.execute(text("INSERT INTO book_fts(book_fts) VALUES ('rebuild')"))
+        db.session.commit()
+
+    def ready(self):
+        return db.session.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'book_fts'")).first() is not None
+
+    def apply(self, query, title, author):
+        parts = []
+        for name, value in (('title', title), ('author', author)):
+            if not value:
+                continue
+            terms = search_terms(value)
+            if not terms:
+                return query.filter(false()), None  # Nothing searchable, e.g. ?q=!!!
+            parts.append(f'{name} : (' + ' '.join(f'"{t}"*' for t in terms) + ')')  # "word"* = prefix match
+        if not parts:
+            return query, None
+
+        hits = (
+            select(book_fts.c.rowid.label('id'), func.bm25(literal_column('book_fts')).label('rank'))
+            .where(book_fts.c.book_fts.op('MATCH')(' AND '.join(parts)))
+            .subquery()
+        )
+        return query.join(hits, Book.id == hits.c.id), hits.c.rank
+
+
+PG_TEXT_CONFIG = literal_column("'simple'::regconfig")  # Must match the index expression exactly
+
+
+class PostgresFtsSearch:
+    """PostgreSQL tsvector expressions with GIN indexes, ranked with ts_rank()"""
+
+    def setup(self):
+        for name in ('title', 'author'):
+            db.session.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_book_{name}_fts ON book "
+                f"USING GIN (to_tsvector('simple'::regconfig, {name}))"
+            ))
+        db.session.commit()
+
+    def ready(self):
+        found = db.session.execute(text("SELECT count(*) FROM pg_indexes WHERE indexname LIKE 'ix_book_%_fts'"))
+        return found.scalar() == 2
+
+    def apply(self, query, title, author):
+        rank = None
+        for col, value in ((Book.title, title), (Book.author, author)):
+            if not value:
+                continue
+            terms = search_terms(value)
+            if not terms:
+                return query.filter(false()), None
+            vector = func.to_tsvector(PG_TEXT_CONFIG, col)
+            tsquery = func.to_tsquery(PG_TEXT_CONFIG, ' & '.join(f'{t}:*' for t in terms))  # t:* = prefix match
+            query = query.filter(vector.op('@@')(tsquery))
+            score = func.ts_rank(vector, tsquery)
+            rank = score if rank is None else rank + score
+        return query, (-rank if rank is not None else None)  # ts_rank: bigger = better, so flip it
+
+
+SEARCH_BACKENDS = {
+    'like': LikeSearch(),
+    'sqlite_fts': SqliteFtsSearch(),
+    'postgres_fts': PostgresFtsSearch(),
+}
+
+
+def best_search_backend():
+    """SEARCH_BACKEND, with 'auto' turned into the best one for this database"""
+    name = current_app.config['SEARCH_BACKEND']
+    if name == 'auto':
+        name = {'sqlite': 'sqlite_fts', 'postgresql': 'postgres_fts'}.get(db.engine.dialect.name, 'like')
+    return name
+
+
+def setup_search():
+    """Build the index of the search backend for this database (init-db)"""
+    name = best_search_backend()
+    try:
+        SEARCH_BACKENDS[name].setup()
+    except OperationalError:  # e.g. SQLite built without FTS5
+        db.session.rollback()
+        name = 'like'
+    current_app.logger.info('Search backend: %s', name)
+    detect_search_backend(current_app)
+
+
+def detect_search_backend(app):
+    """Decide once which backend searches use (needs an app context; no DDL while serving)"""
+    name = app.config['SEARCH_BACKEND']
+    if name == 'auto':
+        name = best_search_backend()
+        if not SEARCH_BACKENDS[name].ready():  # init-db not run yet, or it fell back to LIKE
+            name = 'like'
+    app.extensions['search_backend'] = name if name in SEARCH_BACKENDS else 'like'
+
+
+def search_backend():
+    """The backend searches use (see detect_search_backend())"""
+    return SEARCH_BACKENDS[current_app.extensions['search_backend']]
+
+
+# =============================================================================
+# CONDITIONAL REQUESTS (ETag / Last-Modified)
+# =============================================================================
+# Clients that poll can send back the ETag / Last-Modified we gave them:
+#   If-None-Match: "..."   or   If-Modified-Since: <date>
+# If nothing changed we answer "304 Not Modified" with an empty body, which
+# saves building the JSON and sending it again.
+#   - one book: validators come from its updated_at column
+#   - lists: validators come from the TableVersion counter, so the 304 check
+#     doesn't touch (or serialize) a single book row
+
+def http_date(value):
+    """HTTP dates have no microseconds and are in UTC"""
+    return value.replace(microsecond=0, tzinfo=timezone.utc) if value else None
+
+
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:  # If-None-Match wins over If-Modified-Since
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return http_date(last_modified) <= request.if_modified_since
+    return False
+
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)  # Weak: same data, not necessarily byte-identical JSON
+    if last_modified:
+        response.last_modified = http_date(last_modified)
+    return response
+
+
+def not_modified_response(etag, last_modified):
+    return with_validators(Response(status=304), etag, last_modified)
+
+
+def book_validators(book):
+    changed = book.updated_at or book.created_at
+    stamp = changed.isoformat() if changed else ''
+    return f'book-{book.id}-{stamp}', changed
+
+
+def normalized_args():
+    """?b=2&a=1 and ?a=1&b=2 are the same request, so sort the parameters"""
+    return urlencode(sorted((k, v) for k, v in request.args.items(multi=True) if v != ''))
+
+
+def books_version():
+    """(version, time of the last write) of the book table: one primary-key lookup"""
+    row = db.session.get(TableVersion, 'book')
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def list_validators():
+    """ETag for a list response: table version + the query parameters"""
+    version, changed = books_version()
+    args = hashlib.sha1(normalized_args().encode()).hexdigest()[:16]  # Each page/filter has its own ETag
+    return f'books-v{version}-{args}', changed
+
+
+# =============================================================================
+# RESPONSE CACHE
+# =============================================================================
+# GET responses are cached after they are built the first time (read-through).
+# Keys:
+#   book:<id>:v<version>              - one book
+#   books:<list|search>:<etag>        - the ETag holds the table version
+# Every key holds the table version, so any write - from any worker process,
+# or from async_app.py - moves them all to new keys and old ones just age out.
+# (Dropping the changed book's key would only reach this process's memory cache.)
+# Backends share one interface: get(key), set(key, value), delete(key), stats().
+#   memory      - LRU + TTL dict in this process (each worker has its own)
+#   redis       - a Redis server shared by all workers (pip install redis)
+#   redis-local - in-process stand-in for Redis, for tests and benchmarks
+#   none        - caching off
+
+class MemoryCache:
+    """Least-recently-used cache with a time-to-live, safe to use from many threads"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value), oldest first
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]  # Expired
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)  # Mark as recently used
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)  # Drop the least recently used
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        return {'backend': 'memory', 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self.entries)}
+
+
+class LocalRedis:
+    """Tiny in-process stand-in for a Redis client (get / set with ex= / delete / dbsize)"""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value, expires_at = self.data.get(key, (None, 0))
+            if value is not None and expires_at < time.monotonic():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex):
+        with self.lock:
+            self.data[key] = (value.encode() if isinstance(value, str) else value, time.monotonic() + ex)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def dbsize(self):
+        return len(self.data)
+
+
+class RedisCache:
+    """Cache stored in Redis, shared by every worker process"""
+
+    def __init__(self, client, ttl, prefix='part4:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)  # Redis expires it for us
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def stats(self):
+        # Redis evicts on its own (see "evicted_keys" in INFO), so we can't count evictions here
+        return {'backend': 'redis', 'hits': self.hits, 'misses': self.misses,
+                'evictions': None, 'size': self.client.dbsize()}
+
+
+class NoCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def stats(self):
+        return {'backend': 'none'}
+
+
+def make_cache(config):
+    backend = config['CACHE_BACKEND']
+    if backend == 'memory':
+        return MemoryCache(config['CACHE_MAX_ENTRIES'], config['CACHE_TTL'])
+    if backend == 'redis':
+        import redis  # Optional dependency, only needed for this backend
+        return RedisCache(redis.Redis.from_url(config['CACHE_REDIS_URL']), config['CACHE_TTL'])
+    if backend == 'redis-local':
+        return RedisCache(LocalRedis(), config['CACHE_TTL'])
+    return NoCache()
+
+
+response_cache = LocalProxy(lambda: current_app.extensions['response_cache'])  # The current app's cache
+
+
+def cached_response(entry):
+    """Rebuild a Flask response from a cache entry (or a 304 if the client is up to date)"""
+    last_modified = datetime.fromisoformat(entry['last_modified']) if entry['last_modified'] else None
+    if is_not_modified(entry['etag'], last_modified):
+        return not_modified_response(entry['etag'], last_modified)
+    response = current_app.response_class(entry['body'], mimetype='application/json')
+    return with_validators(response, entry['etag'], last_modified)
+
+
+def cache_entry(response, etag, last_modified):
+    return {
+        'body': response.get_data(as_text=True),
+        'etag': etag,
+        'last_modified': last_modified.isoformat() if last_modified else None,
+    }
 
 
 # =============================================================================
 # REST API ROUTES
 # =============================================================================
 
-# GET /api/books - Get all books
-@app.route('/api/books', methods=['GET'])
+# GET /api/books?limit=20&cursor=<next_cursor> - Get books one page at a time
+@bp.route('/api/books', methods=['GET'])
 def get_books():
-    books = Book.query.all()
-    return jsonify({  # Return JSON response
-        'success': True,
-        'count': len(books),
-        'books': [book.to_dict() for book in books]  # List comprehension to convert all
-    })
+    etag, last_modified = list_validators()
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)  # Client's copy is still up to date
+
+    try:
+        fields = requested_fields()  # ?fields= is part of the ETag (and so of the cache key) already
+    except FieldsError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    mode = stream_mode()
+    if mode:  # Every book, streamed in batches
+        return with_validators(stream_books(Book.query, mode, fields), etag, last_modified)
+
+    key = f'books:list:{etag}'
+    entry = response_cache.get(key)
+    if entry is None:  # Not cached yet: build the page and remember it
+        try:
+            page = paginate(Book.query, fields)
+        except CursorError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        entry = cache_entry(jsonify({'success': True, **page}), etag, last_modified)  # Return JSON response
+        response_cache.set(key, entry)
+
+    return cached_response(entry)
 
 
 # GET /api/books/<id> - Get single book
-@app.route('/api/books/<int:id>', methods=['GET'])
+@bp.route('/api/books/<int:id>', methods=['GET'])
 def get_book(id):
+    try:
+        fields = requested_fields()
+    except FieldsError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    # Only the full book is cached (sparse fieldsets are cheap to build anyway)
+    sparse = fields != book_serializer.all_fields
+    key = f'book:{id}:v{books_version()[0]}'  # A write anywhere moves it on
+    entry = None if sparse else response_cache.get(key)
+    if entry is not None:  # Cached: one primary-key lookup of the version, no book query
+        return cached_response(entry)
+
     book = Book.query.get(id)
 
     if not book:
@@ -73,14 +886,25 @@ def get_book(id):
             'error': 'Book not found'
         }), 404  # Return 404 status code
 
-    return jsonify({
+    etag, last_modified = book_validators(book)
+    if sparse:
+        etag = f'{etag}-{",".join(fields)}'  # Each set of fields is a different representation
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    response = jsonify({
         'success': True,
-        'book': book.to_dict()
+        'book': book_serializer.dump(book, fields)
     })
+    if sparse:
+        return with_validators(response, etag, last_modified)
+    entry = cache_entry(response, etag, last_modified)
+    response_cache.set(key, entry)
+    return cached_response(entry)
 
 
 # POST /api/books - Create new book
-@app.route('/api/books', methods=['POST'])
+@bp.route('/api/books', methods=['POST'])
 def create_book():
     data = request.get_json()  # Get JSON data from request body
 
@@ -106,17 +930,18 @@ def create_book():
     )
 
     db.session.add(new_book)
+    books_changed()
     db.session.commit()
 
     return jsonify({
         'success': True,
         'message': 'Book created successfully',
-        'book': new_book.to_dict()
+        'book': book_serializer.dump(new_book)
     }), 201  # 201 = Created
 
 
 # PUT /api/books/<id> - Update book
-@app.route('/api/books/<int:id>', methods=['PUT'])
+@bp.route('/api/books/<int:id>', methods=['PUT'])
 def update_book(id):
     book = Book.query.get(id)
 
@@ -138,17 +963,18 @@ def update_book(id):
     if 'isbn' in data:
         book.isbn = data['isbn']
 
+    books_changed()
     db.session.commit()
 
     return jsonify({
         'success': True,
         'message': 'Book updated successfully',
-        'book': book.to_dict()
+        'book': book_serializer.dump(book)
     })
 
 
 # DELETE /api/books/<id> - Delete book
-@app.route('/api/books/<int:id>', methods=['DELETE'])
+@bp.route('/api/books/<int:id>', methods=['DELETE'])
 def delete_book(id):
     book = Book.query.get(id)
 
@@ -156,6 +982,7 @@ def delete_book(id):
         return jsonify({'success': False, 'error': 'Book not found'}), 404
 
     db.session.delete(book)
+    books_changed()
     db.session.commit()
 
     return jsonify({
@@ -164,44 +991,258 @@ def delete_book(id):
     })
 
 
+# =============================================================================
+# BULK OPERATIONS
+# =============================================================================
+# Syncing thousands of books one request at a time means thousands of HTTP
+# round trips, ISBN lookups and commits. The /api/books/bulk endpoints take a
+# whole list at once:
+#   - the body is a JSON array, {"books": [...]}, or NDJSON (one object per line)
+#   - every item is validated first, and ISBN conflicts are found with ONE
+#     "WHERE isbn IN (...)" query
+#   - valid rows are written with executemany, BULK_BATCH_SIZE rows per commit
+#   - the response has one result per item, in the same order as the request
+
+class BulkBodyError(ValueError):
+    """Raised when the request body is not a list of items"""
+
+
+def read_bulk_items():
+    if request.mimetype == 'application/x-ndjson':
+        try:
+            items = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        except ValueError as e:
+            raise BulkBodyError(f'Invalid NDJSON: {e}') from e
+    else:
+        data = request.get_json(silent=True)
+        items = data.get('books') if isinstance(data, dict) else data
+
+    if not isinstance(items, list) or not items:
+        raise BulkBodyError('Expected a non-empty list of books')
+    if len(items) > current_app.config['BULK_MAX_ITEMS']:
+        raise BulkBodyError(f"At most {current_app.config['BULK_MAX_ITEMS']} books per request")
+    return items
+
+
+def validate_book_fields(item, partial=False):
+    """Return an error message, or None if the item is OK"""
+    if not isinstance(item, dict):
+        return 'Each book must be a JSON object'
+    for field in ('title', 'author'):
+        if field in item or not partial:
+            if not isinstance(item.get(field), str) or not item[field].strip():
+                return f'{field} is required'
+    if item.get('year') is not None and not isinstance(item['year'], int):
+        return 'year must be a number'
+    if item.get('isbn') is not None and not isinstance(item['isbn'], str):
+        return 'isbn must be a string'
+    return None
+
+
+def find_isbn_owners(isbns):
+    """{isbn: book id} for the ISBNs that already exist - one IN (...) query per batch"""
+    owners = {}
+    isbns = list(isbns)
+    batch_size = current_app.config['BULK_BATCH_SIZE']  # Keep the IN list under the driver's parameter limit
+    for start in range(0, len(isbns), batch_size):
+        rows = db.session.execute(
+            select(Book.isbn, Book.id).where(Book.isbn.in_(isbns[start:start + batch_size]))
+        )
+        owners.update(dict(rows.all()))
+    return owners
+
+
+def in_batches(items):
+    batch_size = current_app.config['BULK_BATCH_SIZE']
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def bulk_response(results):
+    ok = sum(1 for r in results if r['success'])
+    return jsonify({
+        'success': ok == len(results),
+        'succeeded': ok,
+        'failed': len(results) - ok,
+        'results': results,
+    }), 200 if ok else 400
+
+
+# POST /api/books/bulk - Create many books
+@bp.route('/api/books/bulk', methods=['POST'])
+def create_books_bulk():
+    try:
+        items = read_bulk_items()
+    except BulkBodyError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    results = [None] * len(items)
+    for index, item in enumerate(items):
+        error = validate_book_fields(item)
+        if error:
+            results[index] = {'index': index, 'success': False, 'error': error}
+
+    # ISBNs must be unique: check the database and the request itself
+    taken = find_isbn_owners({item['isbn'] for item, r in zip(items, results) if r is None and item.get('isbn')})
+    rows = []  # (index, row) pairs that will be inserted
+    for index, item in enumerate(items):
+        if results[index] is not None:
+            continue
+        isbn = item.get('isbn')
+        if isbn and isbn in taken:
+            results[index] = {'index': index, 'success': False, 'error': 'ISBN already exists'}
+            continue
+        if isbn:
+            taken[isbn] = None
+        rows.append((index, {'title': item['title'], 'author': item['author'],
+                             'year': item.get('year'), 'isbn': isbn}))
+
+    for batch in in_batches(rows):
+        # One executemany per batch; RETURNING gives the new ids in the same order
+        ids = db.session.execute(
+            insert(Book).returning(Book.id, sort_by_parameter_order=True),
+            [row for _, row in batch]
+        ).scalars().all()
+        books_changed()
+        db.session.commit()
+        for (index, _), new_id in zip(batch, ids):
+            results[index] = {'index': index, 'success': True, 'id': new_id}
+
+    response, status = bulk_response(results)
+    return response, (201 if status == 200 else status)
+
+
+# PATCH /api/books/bulk - Update many books ([{"id": 1, "year": 2024}, ...])
+@bp.route('/api/books/bulk', methods=['PATCH'])
+def update_books_bulk():
+    try:
+        items = read_bulk_items()
+    except BulkBodyError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    results = [None] * len(items)
+    for index, item in enumerate(items):
+        error = validate_book_fields(item, partial=True)
+        if not error and not isinstance(item.get('id'), int):
+            error = 'id is required'
+        if error:
+            results[index] = {'index': index, 'success': False, 'error': error}
+
+    valid = [(index, item) for index, item in enumerate(items) if results[index] is None]
+    existing = set()
+    for batch in in_batches([item['id'] for _, item in valid]):
+        existing.update(db.session.execute(select(Book.id).where(Book.id.in_(batch))).scalars())
+    owners = find_isbn_owners({item['isbn'] for _, item in valid if item.get('isbn')})
+
+    rows = []
+    for index, item in valid:
+        isbn = item.get('isbn')
+        if item['id'] not in existing:
+            results[index] = {'index': index, 'success': False, 'error': 'Book not found'}
+        elif isbn and owners.get(isbn, item['id']) != item['id']:
+            results[index] = {'index': index, 'success': False, 'error': 'ISBN already exists'}
+        else:
+            if isbn:
+                owners[isbn] = item['id']  # Two items in this request can't take the same ISBN either
+            rows.append((index, {'id': item['id'], **{
+                field: item[field] for field in ('title', 'author', 'year', 'isbn') if field in item
+            }}))
+
+    for batch in in_batches(rows):
+        db.session.execute(update(Book), [row for _, row in batch])  # UPDATE ... WHERE id = ? (executemany)
+        books_changed()
+        db.session.commit()
+        for index, row in batch:
+            results[index] = {'index': index, 'success': True, 'id': row['id']}
+
+    return bulk_response(results)
+
+
+# DELETE /api/books/bulk - Delete many books ([1, 2, 3] or [{"id": 1}, ...])
+@bp.route('/api/books/bulk', methods=['DELETE'])
+def delete_books_bulk():
+    try:
+        items = read_bulk_items()
+    except BulkBodyError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    ids = [item.get('id') if isinstance(item, dict) else item for item in items]
+    results = [None] * len(items)
+    for index, book_id in enumerate(ids):
+        if not isinstance(book_id, int):
+            results[index] = {'index': index, 'success': False, 'error': 'id is required'}
+
+    deleted = set()
+    for batch in in_batches([book_id for index, book_id in enumerate(ids) if results[index] is None]):
+        found = db.session.execute(select(Book.id).where(Book.id.in_(batch))).scalars().all()
+        db.session.execute(delete(Book).where(Book.id.in_(found)))
+        books_changed()
+        db.session.commit()
+        deleted.update(found)
+
+    for index, book_id in enumerate(ids):
+        if results[index] is None:
+            if book_id in deleted:
+                results[index] = {'index': index, 'success': True, 'id': book_id}
+            else:
+                results[index] = {'index': index, 'success': False, 'error': 'Book not found'}
+
+    return bulk_response(results)
+
+
+# GET /api/cache/stats - Hit / miss / eviction counters of the response cache
+@bp.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'success': True, 'cache': response_cache.stats()})
+
+
 # =============================================================================
 # BONUS: Search and Filter
 # =============================================================================
 
 # GET /api/books/search?q=python&author=john
-@app.route('/api/books/search', methods=['GET'])
+@bp.route('/api/books/search', methods=['GET'])
 def search_books():
-    query = Book.query
-
-    # Filter by title (partial match)
-    title = request.args.get('q')  # Query parameter: ?q=python
-    if title:
-        query = query.filter(Book.title.ilike(f'%{title}%'))  # Case-insensitive LIKE
+    etag, last_modified = list_validators()
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
 
-    # Filter by author
-    author = request.args.get('author')
-    if author:
-        query = query.filter(Book.author.ilike(f'%{author}%'))
+    # Full-text search on title (?q=) and author (?author=), best matches first
+    backend = search_backend()
+    query, rank = backend.apply(Book.query, request.args.get('q'), request.args.get('author'))
 
     # Filter by year
     year = request.args.get('year')
     if year:
         query = query.filter_by(year=int(year))
 
-    books = query.all()
+    try:
+        fields = requested_fields()
+    except FieldsError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
-    return jsonify({
-        'success': True,
-        'count': len(books),
-        'books': [book.to_dict() for book in books]
-    })
+    mode = stream_mode()
+    if mode:
+        return with_validators(stream_books(query, mode, fields), etag, last_modified)
+
+    key = f'books:search:{etag}'
+    entry = response_cache.get(key)
+    if entry is None:
+        try:
+            page = paginate(query, fields, rank)  # Same ?limit= and ?cursor= as /api/books, plus sort=relevance
+        except CursorError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        entry = cache_entry(jsonify({'success': True, **page}), etag, last_modified)
+        response_cache.set(key, entry)
+
+    return cached_response(entry)
 
 
 # =============================================================================
 # SIMPLE WEB PAGE FOR TESTING
 # =============================================================================
 
-@app.route('/')
+@bp.route('/')
 def index():
     return '''
     <html>
@@ -229,7 +1270,7 @@ def index():
 
         <div class="endpoint">
             <span class="method get">GET</span>
-            <code>/api/books</code> - Get all books
+            <code>/api/books?limit=20&amp;cursor=&lt;next_cursor&gt;</code> - Get books, one page at a time
             <br><a href="/api/books" target="_blank">Try it →</a>
         </div>
 
@@ -253,6 +1294,11 @@ def index():
             <code>/api/books/&lt;id&gt;</code> - Delete book
         </div>
 
+        <div class="endpoint">
+            <span class="method post">POST</span> <span class="method put">PATCH</span> <span class="method delete">DELETE</span>
+            <code>/api/books/bulk</code> - Create, update or delete many books at once (JSON array or NDJSON)
+        </div>
+
         <div class="endpoint">
             <span class="method get">GET</span>
             <code>/api/books/search?q=&lt;title&gt;&author=&lt;name&gt;</code> - Search books
@@ -260,8 +1306,15 @@ def index():
 
         <h2>Test with curl:</h2>
         <pre>
-# Get all books
-curl http://localhost:5000/api/books
+# Get the first page of books, then the next one
+curl "http://localhost:5000/api/books?limit=20&sort=created_at&order=desc&total=true"
+curl "http://localhost:5000/api/books?limit=20&sort=created_at&order=desc&cursor=&lt;next_cursor&gt;"
+
+# Only the fields you need (only those columns are read from the database)
+curl "http://localhost:5000/api/books?fields=id,title&limit=100"
+
+# Stream every book, one JSON object per line
+curl -H "Accept: application/x-ndjson" http://localhost:5000/api/books
 
 # Create a book
 curl -X POST http://localhost:5000/api/books \\
@@ -281,28 +1334,155 @@ curl -X DELETE http://localhost:5000/api/books/1
     '''
 
 
+# =============================================================================
+# BULK LOADER (flask load / flask seed)
+# =============================================================================
+# Creating one ORM object per row is slow and keeps every object in memory.
+# dbtools/bulk_load.py streams the rows in batches instead (COPY on PostgreSQL,
+# executemany elsewhere), all in one transaction.
+#
+#   flask --app app load books.csv --batch-size 5000
+#   flask --app app seed --rows 100000
+
+LOADABLE_MODELS = {'book': Book}
+
+
+@bp.cli.command('load')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--model', type=click.Choice(list(LOADABLE_MODELS)), default='book', show_default=True)
+@click.option('--batch-size', default=5000, show_default=True, help='Rows sent per executemany/COPY')
+def load_command(path, model, batch_size):
+    """Bulk-load rows from a CSV or NDJSON file"""
+    table = LOADABLE_MODELS[model].__table__
+    upgrade_db()
+    bulk_load.load_and_report(db.engine, table, bulk_load.read_rows(path), batch_size)
+    books_changed()  # New version: cached lists and ETags are refreshed
+    db.session.commit()
+
+
+@bp.cli.command('seed')
+@click.option('--rows', default=10000, show_default=True)
+@click.option('--batch-size', default=5000, show_default=True)
+def seed_command(rows, batch_size):
+    """Insert generated sample books (for trying things at scale)"""
+    upgrade_db()
+    books = ({'title': f'Book {i}', 'author': f'Author {i % 1000}', 'year': 1950 + i % 75} for i in range(rows))
+    bulk_load.load_and_report(db.engine, Book.__table__, books, batch_size)
+    books_changed()  # New version: cached lists and ETags are refreshed
+    db.session.commit()
+
+
+# =============================================================================
+# MIGRATIONS (flask --app app db ...)
+# =============================================================================
+# db.create_all() only creates tables that are missing. It never adds a column
+# or an index to a table that already exists, so Book.updated_at and the
+# keyset indexes never reached databases created before they were added.
+#
+# Migrations do: every schema change is a numbered script in
+# migrations/versions/ (Alembic, through Flask-Migrate), and the database
+# remembers the last script it ran (table alembic_version).
+#
+#   flask --app app db migrate -m "add publisher"   # Write the next script from your model changes
+#   flask --app app db upgrade                      # Run the scripts this database hasn't run yet
+#   flask --app app db downgrade                    # Undo the last one
+#
+# Changing a big table without stopping the API (see migrations/versions/):
+# - 0002 adds updated_at as a nullable column (no table rewrite), then fills
+#   it in batches of ids. Each batch commits on its own, so no lock is held
+#   for long and a crash loses at most one batch.
+# - 0003 builds the indexes with CREATE INDEX CONCURRENTLY on PostgreSQL:
+#   reads and writes go on while the index is built.
+#
+# init-db runs `upgrade` for you. A database made by db.create_all() (before
+# there were migrations) is first marked as being at BASELINE_REVISION; the
+# later scripts skip what create_all() already made.
+#
+# Alembic is only imported when a migration runs (or for `flask ...`
+# commands), so a server starting up doesn't pay for it.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+BASELINE_REVISION = '0001'  # The book table as the first version of this file created it
+
+
+def not_search_object(name, type_, parent_names):
+    """Keep `flask db migrate` away from the full-text tables and indexes (setup_search() owns them)"""
+    return '_fts' not in (name or '')
+
+
+def setup_migrations(app):
+    """Register Flask-Migrate on `app` (the `flask db ...` commands need it)"""
+    from flask_migrate import Migrate
+
+    if 'migrate' not in app.extensions:
+        Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True,  # Batch mode: SQLite can't ALTER most things
+                include_name=not_search_object)
+
+
+def upgrade_db():
+    """Run the migrations this database hasn't run yet (needs an app context)"""
+    from flask_migrate import stamp, upgrade
+
+    setup_migrations(current_app)
+    tables = inspect(db.engine).get_table_names()
+    if tables and 'alembic_version' not in tables:  # Created by db.create_all()
+        stamp(revision=BASELINE_REVISION)
+    upgrade()
+
+
 # =============================================================================
 # INITIALIZE DATABASE WITH SAMPLE DATA
 # =============================================================================
 
 def init_db():
+    """Create tables, sample books and the search index (needs an app context)"""
+    upgrade_db()  # Create (or update) the tables, see MIGRATIONS above
+
+    if Book.query.count() == 0:
+        sample_books = [
+            Book(title='Python Crash Course', author='Eric Matthes', year=2019, isbn='978-1593279288'),
+            Book(title='Flask Web Development', author='Miguel Grinberg', year=2018, isbn='978-1491991732'),
+            Book(title='Clean Code', author='Robert C. Martin', year=2008, isbn='978-0132350884'),
+        ]
+        db.session.add_all(sample_books)
+        books_changed()
+        db.session.commit()
+        click.echo('Sample books added!')
+
+    setup_search()  # Full-text index for /api/books/search
+
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the tables, sample books and search index (run once before serving)"""
+    init_db()
+    click.echo('Database initialized!')
+
+
+# =============================================================================
+# PRODUCTION SERVER (flask --app app serve)
+# =============================================================================
+# dbtools/serve.py runs the app under gunicorn: several worker processes, all
+# forked from this one. A forked worker inherits the parent's open database
+# connections, so reset_after_fork() drops them: two processes must never
+# share one.
+
+def reset_after_fork(app):
+    """Runs in every new worker process (gunicorn's post_fork hook)"""
     with app.app_context():
-        db.create_all()
+        for engine in db.engines.values():
+            engine.dispose(close=False)  # Forget the parent's pooled connections (closing them would close the parent's)
+    prometheus.metrics.reset()  # Numbers counted before the fork belong to the parent
+
 
-        if Book.query.count() == 0:
-            sample_books = [
-                Book(title='Python Crash Course', author='Eric Matthes', year=2019, isbn='978-1593279288'),
-                Book(title='Flask Web Development', author='Miguel Grinberg', year=2018, isbn='978-1491991732'),
-                Book(title='Clean Code', author='Robert C. Martin', year=2008, isbn='978-0132350884'),
-            ]
-            db.session.add_all(sample_books)
-            db.session.commit()
-            print('Sample books added!')
+bp.cli.add_command(serve.make_command(reset_after_fork))
 
 
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True)
+    app = create_app({'DEBUG': True})  # Debug mode also serves /debug/queries, /metrics
+    with app.app_context():
+        init_db()
+    app.run()
 
 
 # =============================================================================
@@ -354,7 +1534,8 @@ if __name__ == '__main__':
 # you can directly use ipaddress:portnumber/apiroute from any where. So your HTML JS code can be anywhere on computer (not necessarily in flask)  
 
 # 3. Add pagination: `/api/books?page=1&per_page=10` 
-# Hint - the sqlalchemy provides paginate method. 
+# Hint - the sqlalchemy provides paginate method. (/api/books itself now uses
+# keyset pagination - compare the two approaches on a big table!)
 # OPTIONAL - For ease of understanding, create a new api say /api/books-with-pagination which takes page number and number of books per page
 
 # 4. Add sorting: `/api/books?sort=title&order=desc`
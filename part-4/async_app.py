@@ -0,0 +1,386 @@
+"""
+Part 4 (async): The Book API on asyncio
+=======================================
+The same /api/books routes as app.py, with the same JSON, written with
+async views and SQLAlchemy's asyncio extension.
+
+Why? In app.py (Flask on WSGI) every request holds a thread while it waits
+for the database. Here a request that waits on the database gives the event
+loop back, so ONE thread can juggle hundreds of open requests. That pays off
+when the database is far away (PostgreSQL over the network) and many clients
+are connected at once; for fast local SQLite queries the extra machinery can
+even make it slower. benchmarks/bench_async.py measures both.
+
+What You'll Learn:
+- async def views (Quart: the Flask API on ASGI)
+- create_async_engine() and AsyncSession
+- await session.get() / session.scalars() / session.commit()
+- Async database drivers: aiosqlite (SQLite) and asyncpg (PostgreSQL)
+
+Install: pip install quart "sqlalchemy[asyncio]" aiosqlite uvicorn
+         (plus asyncpg for PostgreSQL)
+Run:     uvicorn async_app:create_app --factory --port 5001
+         (or: python async_app.py)
+
+The tables come from app.py's migrations: run `flask --app app init-db`
+first (this app refuses to start on a database that wasn't migrated).
+
+Not ported from app.py: bulk endpoints, full-text search backends (search
+here uses LIKE), ETags, the response cache, streaming, /metrics and ?fields=
+(to_dict() below builds every field from a full ORM object). Writes made
+here still bump app.py's table_version, and every key of app.py's response
+cache contains that version, so app.py never serves a book changed here.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+from quart import Blueprint, Quart, current_app, request, jsonify
+from sqlalchemy import Column, DateTime, Index, Integer, String, and_, func, inspect, or_, select, text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from werkzeug.local import LocalProxy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for dbtools/
+from dbtools import sqlite  # noqa: E402
+from dbtools.cursors import CursorError, decode_cursor, encode_cursor  # noqa: E402
+
+bp = Blueprint('main', __name__)  # Routes; create_app() attaches them to an app
+
+# =============================================================================
+# DATABASE (async engine)
+# =============================================================================
+# Same database as app.py: DATABASE_URL, or instance/api_demo.db next to this
+# file (where Flask-SQLAlchemy puts 'sqlite:///api_demo.db'). Only the driver
+# changes: the URL gets an async driver name.
+
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+ASYNC_DRIVERS = {  # Sync URL prefix -> async driver
+    'sqlite://': 'sqlite+aiosqlite://',
+    'postgresql://': 'postgresql+asyncpg://',
+    'postgres://': 'postgresql+asyncpg://',
+}
+
+
+def async_url(url):
+    """'sqlite:///x.db' -> 'sqlite+aiosqlite:///x.db' (URLs that name a driver are kept)"""
+    for prefix, async_prefix in ASYNC_DRIVERS.items():
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+# =============================================================================
+# APPLICATION FACTORY (like app.py's create_app)
+# =============================================================================
+# Each app gets its own engine and session factory in app.extensions; views
+# open sessions with Session(), which uses the current app's.
+
+def create_app(config=None):
+    """Build the app; `config` overrides the defaults below, e.g. {'DATABASE_URL': ...}"""
+    app = Quart(__name__)
+    app.config['DATABASE_URL'] = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(INSTANCE_DIR, 'api_demo.db'))
+    app.config['DEFAULT_PAGE_SIZE'] = 20  # Books per page when ?limit= is not given
+    app.config['MAX_PAGE_SIZE'] = 100  # Largest ?limit= a client may ask for
+    app.config['SQLITE_PRAGMAS'] = dict(sqlite.PRAGMAS)  # WAL, bigger cache, mmap: see dbtools/sqlite.py ({} = SQLite defaults)
+    app.config.update(config or {})
+
+    engine = create_async_engine(async_url(app.config['DATABASE_URL']))
+    sqlite.tune_engine(engine.sync_engine, app.config)  # Events live on the sync core
+    app.extensions['engine'] = engine
+    app.extensions['sessionmaker'] = async_sessionmaker(engine, expire_on_commit=False)  # Objects stay readable after commit
+    app.before_serving(check_database)
+    app.after_serving(close_engine)
+    app.register_blueprint(bp)
+    return app
+
+
+Session = LocalProxy(lambda: current_app.extensions['sessionmaker'])  # The current app's: `async with Session() as session`
+
+
+# =============================================================================
+# MODELS (same tables as app.py)
+# =============================================================================
+# Flask-SQLAlchemy's db.Model is sync-only, so the models use plain
+# SQLAlchemy declarative classes. Columns and indexes match app.py, so both
+# apps can share one database.
+
+Base = declarative_base()
+
+
+class Book(Base):
+    __tablename__ = 'book'
+    __table_args__ = (  # Composite indexes matching the keyset sorts: (sort column, id)
+        Index('ix_book_created_at_id', 'created_at', 'id'),
+        Index('ix_book_title_id', 'title', 'id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String(200), nullable=False)
+    author = Column(String(100), nullable=False, index=True)
+    year = Column(Integer, index=True)
+    isbn = Column(String(20), unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):  # Same JSON shape as app.py
+        return {
+            'id': self.id,
+            'title': self.title,
+            'author': self.author,
+            'year': self.year,
+            'isbn': self.isbn,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class TableVersion(Base):
+    """app.py's change counter: bumped here too, so its list ETags and cache keys move on"""
+    __tablename__ = 'table_version'
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+async def books_changed(session):
+    """Call in every write to the book table, before commit"""
+    bumped = await session.execute(
+        update(TableVersion)
+        .where(TableVersion.name == 'book')
+        .values(version=TableVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if bumped.rowcount == 0:  # First write ever
+        session.add(TableVersion(name='book', version=1, updated_at=datetime.utcnow()))
+
+
+def schema_version(sync_conn):
+    """The Alembic revision app.py's migrations left in the database (None = not migrated)"""
+    if not inspect(sync_conn).has_table('alembic_version'):
+        return None
+    return sync_conn.execute(text('SELECT version_num FROM alembic_version')).scalar()
+
+
+async def check_database():
+    """Don't create tables here: app.py's migrations own the schema (create_all would skip them)"""
+    engine = current_app.extensions['engine']
+    os.makedirs(INSTANCE_DIR, exist_ok=True)  # SQLite creates the file, but not its folder
+    async with engine.connect() as conn:
+        version = await conn.run_sync(schema_version)  # Inspection is sync: run it on the async connection
+    if version is None:
+        raise RuntimeError(f'{engine.url.render_as_string(hide_password=True)} has no migrated tables: '
+                           'run `flask --app app init-db` (or `flask --app app db upgrade`) in part-4 first')
+
+
+async def close_engine():
+    await current_app.extensions['engine'].dispose()
+
+
+# =============================================================================
+# KEYSET PAGINATION (same ?sort=&order=&limit=&cursor=&total= as app.py)
+# =============================================================================
+# Cursors come from dbtools/cursors.py, like app.py's: a next_cursor from
+# app.py works here and back.
+
+SORT_COLUMNS = {
+    'created_at': Book.created_at,
+    'id': Book.id,
+    'title': Book.title,
+}
+
+
+async def paginate(session, query):
+    """Apply the paging arguments to a select(Book) and run it. Raises CursorError"""
+    sort = request.args.get('sort', 'created_at')
+    if sort not in SORT_COLUMNS:
+        sort = 'created_at'
+    descending = request.args.get('order', 'asc') == 'desc'
+    limit = request.args.get('limit', current_app.config['DEFAULT_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+    column = SORT_COLUMNS[sort]
+
+    total = None
+    if request.args.get('total') == 'true':  # COUNT(*) scans the whole result: only on request
+        total = await session.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if descending:
+            query = query.where(or_(column < value, and_(column == value, Book.id < last_id)))
+        else:
+            query = query.where(or_(column > value, and_(column == value, Book.id > last_id)))
+
+    if descending:
+        query = query.order_by(column.desc(), Book.id.desc())
+    else:
+        query = query.order_by(column.asc(), Book.id.asc())
+
+    # await: the event loop serves other requests while the database works
+    rows = (await session.execute(query.add_columns(column).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    books = [row[0] for row in rows]
+
+    page = {
+        'count': len(books),
+        'books': [book.to_dict() for book in books],
+        'has_more': has_more,
+        'next_cursor': encode_cursor(sort, rows[-1][1], books[-1].id) if has_more else None,
+    }
+    if total is not None:
+        page['total'] = total
+    return page
+
+
+# =============================================================================
+# REST API ROUTES
+# =============================================================================
+# Each view opens its own AsyncSession; "async with" closes it (and returns
+# the connection to the pool) when the view is done.
+
+@bp.route('/api/books', methods=['GET'])
+async def get_books():
+    async with Session() as session:
+        try:
+            page = await paginate(session, select(Book))
+        except CursorError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **page})
+
+
+@bp.route('/api/books/<int:id>', methods=['GET'])
+async def get_book(id):
+    async with Session() as session:
+        book = await session.get(Book, id)
+
+    if not book:
+        return jsonify({'success': False, 'error': 'Book not found'}), 404
+
+    return jsonify({'success': True, 'book': book.to_dict()})
+
+
+@bp.route('/api/books', methods=['POST'])
+async def create_book():
+    data = await request.get_json(silent=True)  # Reading the body is async too
+
+    if not data:
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+    if not data.get('title') or not data.get('author'):
+        return jsonify({'success': False, 'error': 'Title and author are required'}), 400
+
+    async with Session() as session:
+        if data.get('isbn'):
+            existing = await session.scalar(select(Book.id).where(Book.isbn == data['isbn']))
+            if existing:
+                return jsonify({'success': False, 'error': 'ISBN already exists'}), 400
+
+        new_book = Book(
+            title=data['title'],
+            author=data['author'],
+            year=data.get('year'),
+            isbn=data.get('isbn')
+        )
+        session.add(new_book)
+        await books_changed(session)
+        await session.commit()
+
+    return jsonify({
+        'success': True,
+        'message': 'Book created successfully',
+        'book': new_book.to_dict()
+    }), 201
+
+
+@bp.route('/api/books/<int:id>', methods=['PUT'])
+async def update_book(id):
+    data = await request.get_json(silent=True)
+
+    async with Session() as session:
+        book = await session.get(Book, id)
+
+        if not book:
+            return jsonify({'success': False, 'error': 'Book not found'}), 404
+
+        if not data:
+            return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+        for field in ('title', 'author', 'year', 'isbn'):
+            if field in data:
+                setattr(book, field, data[field])
+
+        await books_changed(session)
+        await session.commit()
+
+    return jsonify({
+        'success': True,
+        'message': 'Book updated successfully',
+        'book': book.to_dict()
+    })
+
+
+@bp.route('/api/books/<int:id>', methods=['DELETE'])
+async def delete_book(id):
+    async with Session() as session:
+        book = await session.get(Book, id)
+
+        if not book:
+            return jsonify({'success': False, 'error': 'Book not found'}), 404
+
+        await session.delete(book)
+        await books_changed(session)
+        await session.commit()
+
+    return jsonify({
+        'success': True,
+        'message': 'Book deleted successfully'
+    })
+
+
+@bp.route('/api/books/search', methods=['GET'])
+async def search_books():
+    query = select(Book)
+
+    title = request.args.get('q')
+    if title:
+        query = query.where(Book.title.ilike(f'%{title}%'))  # LIKE only: see app.py for full-text search
+    author = request.args.get('author')
+    if author:
+        query = query.where(Book.author.ilike(f'%{author}%'))
+    year = request.args.get('year')
+    if year:
+        query = query.where(Book.year == int(year))
+
+    async with Session() as session:
+        try:
+            page = await paginate(session, query)
+        except CursorError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **page})
+
+
+if __name__ == '__main__':
+    create_app().run(port=5001)  # Quart's built-in server (Hypercorn); use uvicorn for benchmarks
+
+
+# =============================================================================
+# SYNC vs ASYNC - WHAT CHANGED FROM app.py:
+# =============================================================================
+#
+# app.py (Flask, WSGI)                    async_app.py (Quart, ASGI)
+# -------------------------------------   --------------------------------------
+# def get_book(id):                       async def get_book(id):
+# Book.query.get(id)                      await session.get(Book, id)
+# query.all()                             (await session.execute(query)).all()
+# db.session.commit()                     await session.commit()
+# request.get_json()                      await request.get_json()
+# one thread per request in flight        one event loop, many requests in flight
+#
+# Rule of thumb: async helps when requests spend most of their time WAITING
+# (network databases, other APIs) and you have many clients at once. It does
+# not make a single query faster, and CPU work (JSON, templates) still runs
+# one request at a time on the loop.
+#
+# =============================================================================
@@ -0,0 +1,33 @@
+"""initial tables
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17 06:46:41.171448
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('book',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('author', sa.String(length=100), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=True),
+    sa.Column('isbn', sa.String(length=20), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('isbn')
+    )
+
+
+def downgrade():
+    op.drop_table('book')
@@ -0,0 +1,55 @@
+"""add book.updated_at (backfilled in batches) and table_version
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 07:05:32.640917
+
+Adding a nullable column without a default is instant: the table isn't
+rewritten. Filling it with one big UPDATE would lock every row for as long
+as it runs, so the backfill goes BATCH_SIZE ids at a time, each batch in its
+own transaction (autocommit_block). The API keeps working in between, and
+after a crash `flask db upgrade` carries on: filled rows are skipped.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000  # Rows updated per transaction
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'updated_at' not in {column['name'] for column in inspector.get_columns('book')}:
+        with op.batch_alter_table('book', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    if not inspector.has_table('table_version'):
+        op.create_table('table_version',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+        )
+
+    book = sa.table('book', sa.column('id'), sa.column('created_at'), sa.column('updated_at'))
+    with op.get_context().autocommit_block():  # Every statement below commits on its own
+        bind = op.get_bind()
+        last_id = bind.scalar(sa.select(sa.func.max(book.c.id))) or 0
+        for start in range(0, last_id, BATCH_SIZE):
+            bind.execute(
+                book.update()
+                .where(book.c.id > start, book.c.id <= start + BATCH_SIZE, book.c.updated_at.is_(None))
+                .values(updated_at=book.c.created_at)
+            )
+
+
+def downgrade():
+    op.drop_table('table_version')
+    with op.batch_alter_table('book', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,45 @@
+"""book indexes for filters and keyset pagination (built online)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 07:18:04.215530
+
+A plain CREATE INDEX blocks every write to the table until the index is
+built. On PostgreSQL, CREATE INDEX CONCURRENTLY builds it while inserts and
+updates go on. It can't run inside a transaction, hence autocommit_block().
+Other databases ignore postgresql_concurrently and build it the normal way.
+
+If a concurrent build fails, PostgreSQL leaves an INVALID index behind:
+drop it (DROP INDEX ix_book_...;) and run `flask db upgrade` again.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_book_author': ['author'],
+    'ix_book_year': ['year'],
+    'ix_book_created_at_id': ['created_at', 'id'],
+    'ix_book_title_id': ['title', 'id'],
+}
+
+
+def upgrade():
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('book')}
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            if name not in existing:  # Already made by db.create_all() before this database used migrations
+                op.create_index(name, 'book', columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in reversed(list(INDEXES)):
+            op.drop_index(name, table_name='book', postgresql_concurrently=True)
@@ -14,36 +14,331 @@ Prerequisites: Complete all previous parts
 Install: pip install psycopg2-binary pymysql python-dotenv
 """
 
+import itertools
+import logging
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, flash, has_request_context
+from flask import session as browser_session  # The signed cookie (db.session is the database one)
 from flask_sqlalchemy import SQLAlchemy
-from dotenv import load_dotenv  # Load .env file
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event, func, inspect, select, text
+from sqlalchemy.exc import DBAPIError, OperationalError, TimeoutError as PoolTimeout
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.pool import NullPool, QueuePool
+from werkzeug.local import LocalProxy
 
-# Load environment variables from .env file
-load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for dbtools/
+from dbtools import bulk_load, prometheus, serve, sqlite, templates, timing  # noqa: E402
+from dbtools.prometheus import metrics  # noqa: E402
+from dbtools.serializers import Serializer  # noqa: E402
+
+bp = Blueprint('main', __name__, cli_group=None)  # Routes and commands; create_app() attaches them to an app
+
+
+# =============================================================================
+# APPLICATION FACTORY
+# =============================================================================
+# create_app() builds a new app every time it is called (see part-1). Models
+# and routes are defined once, below, on `db` and the blueprint `bp`;
+# create_app() connects them to the app it builds.
+#
+# Importing this file does no setup: .env is read and the engines are created
+# (which imports the database driver, e.g. psycopg2) when create_app() runs.
+# The tables are created by `flask --app app init-db` (or `python app.py`),
+# not every time a server starts (see MIGRATIONS).
+
+def create_app(config=None):
+    """Build the app; `config` overrides the defaults below, e.g. {'SQLALCHEMY_DATABASE_URI': ...}"""
+    from dotenv import load_dotenv  # Imported here: nothing else needs it
+    load_dotenv()  # Load environment variables from .env file
+
+    app = Flask(__name__)
+    app.secret_key = os.getenv('SECRET_KEY', 'fallback-secret-key')  # Get from env or use fallback
+
+    # DATABASE CONFIGURATION
+    # Get database URL from environment variable
+    # Falls back to SQLite if not set
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///default.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['PAGE_SIZE'] = 50  # Products on the home page (and per "Load more")
+    app.config['TEMPLATE_CACHE_DIR'] = os.path.join(app.instance_path, 'jinja_cache')  # Compiled templates (None = off)
+    app.config['FRAGMENT_CACHE_TTL'] = 300  # Seconds a {% cache %} fragment is served before it is rendered again
+    app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = 10000  # Least recently used fragments go first
+    app.config['EXPOSE_FRAGMENT_CACHE_STATS'] = os.getenv('EXPOSE_FRAGMENT_CACHE_STATS') == '1'  # GET /debug/fragment-cache outside debug mode
+
+    # Connection pool settings (for production), every one can be set from the environment
+    pool_class = os.getenv('DB_POOL_CLASS', 'queue')
+    if pool_class not in POOL_CLASSES:
+        raise ValueError(f'DB_POOL_CLASS must be one of {", ".join(POOL_CLASSES)}, not {pool_class!r}')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': POOL_CLASSES[pool_class],
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True') == 'True',  # Check connection validity before using
+    }
+    if pool_class != 'null':  # NullPool keeps nothing open, so there is nothing to size
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),  # Number of connections to keep open
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),  # Extra ones under load, closed when returned
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),  # Whole seconds to wait for a free one, then fail
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '3600')),  # Recycle connections after 1 hour
+            'pool_use_lifo': pool_class == 'lifo',
+        })
+
+    app.config['SQLITE_PRAGMAS'] = dict(sqlite.PRAGMAS)  # WAL, bigger cache, mmap: see dbtools/sqlite.py ({} = SQLite defaults)
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '100'))  # Statements slower than this go to the slow-query log
+    app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG')  # Slow-query log file (None = print to the console)
+    app.config['EXPOSE_QUERY_STATS'] = os.getenv('EXPOSE_QUERY_STATS') == '1'  # GET /debug/queries outside debug mode (shows raw SQL)
+    app.config['METRICS_DIR'] = os.getenv('METRICS_DIR')  # Folder shared by worker processes for /metrics (None = one process)
+    app.config['EXPOSE_METRICS'] = os.getenv('EXPOSE_METRICS') == '1'  # GET /metrics outside debug mode (for Prometheus)
+
+    # Read replicas (optional): comma-separated URLs. Reads go there, writes go to DATABASE_URL
+    app.config['DATABASE_REPLICA_URLS'] = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    app.config['REPLICA_STRATEGY'] = os.getenv('REPLICA_STRATEGY', 'round_robin')  # or 'least_connections'
+    app.config['REPLICA_HEALTH_INTERVAL'] = 5  # Seconds between "SELECT 1" checks of each replica
+    app.config['REPLICA_RETRY_AFTER'] = 30  # Seconds a failed replica is left alone before it is tried again
+    app.config['READ_YOUR_WRITES_SECONDS'] = 5  # After a write, that browser reads from the primary (replicas lag)
+    app.config.update(config or {})
+    # One more engine per replica. Flask-SQLAlchemy only applies SQLALCHEMY_ENGINE_OPTIONS to the
+    # default engine, so each bind repeats them (pool class and sizes, pre-ping, timeouts)
+    app.config['SQLALCHEMY_BINDS'] = {
+        f'replica_{n}': {'url': url, **app.config['SQLALCHEMY_ENGINE_OPTIONS'], 'pool_logging_name': f'replica_{n}'}
+        for n, url in enumerate(app.config['DATABASE_REPLICA_URLS'])
+    }
+
+    db.init_app(app)
+    setup_replicas(app)
+    with app.app_context():
+        for engine in db.engines.values():  # The primary and every replica
+            sqlite.tune_engine(engine, app.config)
+        timing.init_app(app, db.engines.values())
+    setup_metrics(app)
+    templates.init_app(app)
+    if click.get_current_context(silent=True):  # Started by the `flask` command: add `flask db ...`
+        setup_migrations(app)
+    app.register_blueprint(bp)
+    return app
 
-app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY', 'fallback-secret-key')  # Get from env or use fallback
 
 # =============================================================================
-# DATABASE CONFIGURATION
+# CONNECTION POOL
 # =============================================================================
 
-# Get database URL from environment variable
-# Falls back to SQLite if not set
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///default.db')
+pool_log = logging.getLogger(__name__)  # Not current_app.logger: checkouts also happen outside an app context
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long every checkout took and when it ran dry (see METRICS)"""
+
+    def _do_get(self):
+        database = self.logging_name or 'primary'  # Replica binds set pool_logging_name to their key
+        started = time.perf_counter()
+        if self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow:
+            metrics.add('db_pool_exhausted_total', database=database)  # Every connection is busy: this request has to wait
+        try:
+            return super()._do_get()  # Waits here (up to pool_timeout) for a connection to come back
+        except PoolTimeout:
+            metrics.add('db_pool_timeouts_total', database=database)
+            pool_log.warning('No free %s connection after %ss (pool_size=%s, max_overflow=%s)',
+                             database, self._timeout, self.size(), self._max_overflow)
+            raise
+        finally:
+            metrics.observe('db_pool_wait_seconds', time.perf_counter() - started, database=database)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Connection pool settings (for production)
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_size': 10,  # Number of connections to keep open
-    'pool_recycle': 3600,  # Recycle connections after 1 hour
-    'pool_pre_ping': True,  # Check connection validity before using
+POOL_CLASSES = {  # DB_POOL_CLASS options
+    'queue': TimedQueuePool,  # Keeps pool_size connections open, hands them out oldest-first
+    'lifo': TimedQueuePool,  # Same, but reuses the most recent one, so spare ones idle and get recycled
+    'null': NullPool,  # No pool: connect per checkout (behind pgbouncer, which does the pooling)
 }
 
-db = SQLAlchemy(app)
+
+# =============================================================================
+# READ REPLICAS
+# =============================================================================
+# A replica is a read-only copy of the primary database that the database
+# server keeps up to date. Sending reads there leaves the primary free for
+# writes. RoutingSession decides for every statement:
+#   - SELECT -> a healthy replica (round robin or least connections)
+#   - INSERT / UPDATE / DELETE, flushes, SELECT ... FOR UPDATE -> primary
+#   - after a request has written, its later reads -> primary (a replica may
+#     not have the new row yet); the same for that browser's next requests
+#     for READ_YOUR_WRITES_SECONDS (e.g. the redirect after "Add product")
+#   - no healthy replica -> primary
+# Without DATABASE_REPLICA_URLS everything goes to the primary, as before.
+
+class ReplicaSet:
+    """The replica engines of one app, which of them are healthy, and whose turn it is"""
+
+    def __init__(self, app, engines):
+        self.app = app
+        self.engines = engines
+        self.turn = itertools.count()
+        self.lock = threading.Lock()
+        self.down_until = {}  # engine -> time.monotonic() when it may be tried again
+        self.checked_at = {}  # engine -> time.monotonic() of the last health check
+
+    def is_healthy(self, engine):
+        """Skip replicas marked down; run SELECT 1 at most every REPLICA_HEALTH_INTERVAL seconds"""
+        now = time.monotonic()
+        if self.down_until.get(engine, 0) > now:
+            return False
+        with self.lock:
+            due = now - self.checked_at.get(engine, float('-inf')) >= self.app.config['REPLICA_HEALTH_INTERVAL']
+            if due:
+                self.checked_at[engine] = now
+        if due:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT 1'))
+            except DBAPIError:
+                self.mark_down(engine)
+                return False
+        return True
+
+    def mark_down(self, engine):
+        now = time.monotonic()
+        was_up = self.down_until.get(engine, 0) <= now
+        self.down_until[engine] = now + self.app.config['REPLICA_RETRY_AFTER']
+        if was_up:  # The health check and handle_error may both notice: warn once
+            self.app.logger.warning('Replica %s is down, skipping it for %ss',
+                                    engine.url.render_as_string(hide_password=True), self.app.config['REPLICA_RETRY_AFTER'])
+
+    def failed(self, context):
+        """handle_error listener: a replica could not connect or lost its connection"""
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+            self.mark_down(context.engine)
+
+    def pick(self):
+        """A healthy replica engine, or None (then the primary is used)"""
+        healthy = [engine for engine in self.engines if self.is_healthy(engine)]
+        if not healthy:
+            return None
+        if self.app.config['REPLICA_STRATEGY'] == 'least_connections':
+            return min(healthy, key=lambda engine: getattr(engine.pool, 'checkedout', lambda: 0)())
+        return healthy[next(self.turn) % len(healthy)]
+
+
+replicas = LocalProxy(lambda: current_app.extensions['replicas'])  # The current app's ReplicaSet
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy's session, but plain SELECTs may be answered by a replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and replicas.engines:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info['wrote'] = True  # Read your own writes for the rest of this request
+            elif self.may_use_replica(clause):
+                replica = replicas.pick()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def may_use_replica(self, clause):
+        if not isinstance(clause, Select) or clause._for_update_arg is not None:
+            return False  # text(), SELECT ... FOR UPDATE and anything unknown: primary
+        if self.info.get('wrote'):
+            return False
+        return not (has_request_context() and browser_session.get('primary_until', 0) > time.time())
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # create_app() calls db.init_app(app)
+
+
+@event.listens_for(db.session, 'after_commit')
+def remember_write(session):
+    """This browser just wrote: read from the primary for a few seconds (survives the redirect)"""
+    if session.info.get('wrote') and has_request_context():
+        browser_session['primary_until'] = time.time() + current_app.config['READ_YOUR_WRITES_SECONDS']
+
+
+def setup_replicas(app):
+    """Called by create_app(): a ReplicaSet for the engines made from SQLALCHEMY_BINDS"""
+    with app.app_context():
+        replica_set = ReplicaSet(app, [db.engines[key] for key in app.config['SQLALCHEMY_BINDS']])
+    for replica in replica_set.engines:
+        event.listen(replica, 'handle_error', replica_set.failed)
+    app.extensions['replicas'] = replica_set
+
+
+def sqlite_path(engine):
+    database = engine.url.database
+    return database[len('file:'):] if engine.url.query.get('uri') else database
+
+
+@bp.cli.command('replica-sync')
+def replica_sync_command():
+    """SQLite only: copy the primary into every replica file (local stand-in for replication)"""
+    if any(engine.dialect.name != 'sqlite' for engine in [db.engine, *replicas.engines]):
+        raise click.ClickException('Only for SQLite files: PostgreSQL replicas are kept up to date '
+                                   'by the server (streaming replication)')
+    source = sqlite3.connect(sqlite_path(db.engine))
+    for replica in replicas.engines:
+        target = sqlite3.connect(sqlite_path(replica))  # Writable: the app opens it read-only (mode=ro)
+        source.backup(target)  # A consistent copy, even while the app is writing
+        target.close()
+        click.echo(f'Copied {sqlite_path(db.engine)} -> {sqlite_path(replica)}')
+    source.close()
+
+
+# =============================================================================
+# QUERY TIMING
+# =============================================================================
+# Every statement is timed by dbtools/timing.py: GET /debug/queries, the
+# slow-query log (SLOW_QUERY_MS) and a Server-Timing header on every response.
+
+
+# =============================================================================
+# METRICS (GET /metrics, Prometheus text format)
+# =============================================================================
+# dbtools/prometheus.py counts requests and pool usage for every engine (set
+# METRICS_DIR when running several workers). This part adds pool exhaustion
+# (see TimedQueuePool) and replica health.
+
+metrics.define('db_pool_exhausted_total', 'counter',
+               'Checkouts that found every connection busy and had to wait, per database')
+metrics.define('db_pool_timeouts_total', 'counter',
+               'Checkouts that gave up after pool_timeout (answered with 503), per database')
+metrics.define('db_replica_up', 'gauge', '1 while a read replica passes its health checks, 0 while it is skipped')
+
+
+def collect_replica_health(engines, replica_set):
+    """engines: {'primary': engine, 'replica_0': engine, ...}"""
+    metrics.replace('db_replica_up', [({'database': name}, int(replica_set.down_until.get(engine, 0) <= time.monotonic()))
+                                      for name, engine in engines.items() if engine in replica_set.engines])
+
+
+def setup_metrics(app):
+    """Called by create_app(): request and pool metrics for every engine, plus replica health"""
+    with app.app_context():
+        named_engines = {key or 'primary': engine for key, engine in db.engines.items()}  # None = the default bind
+    prometheus.init_app(app, named_engines)
+    replica_set = app.extensions['replicas']
+    metrics.collectors['db_replica'] = lambda: collect_replica_health(named_engines, replica_set)
+
+
+@bp.app_errorhandler(PoolTimeout)
+def pool_timeout(error):
+    """Every connection stayed busy for pool_timeout seconds: tell the client to retry shortly"""
+    return 'Too busy: no free database connection. Please try again.', 503, {'Retry-After': '1'}
+
+
+# =============================================================================
+# TEMPLATE CACHING
+# =============================================================================
+# Two caches make HTML pages cheaper (see dbtools/templates.py):
+#   - compiled templates are kept in TEMPLATE_CACHE_DIR for new worker processes
+#   - {% cache key %} ... {% endcache %} keeps rendered HTML, e.g. one table row
+#     per key in product_rows.html; GET /debug/fragment-cache shows hits and misses
+#     (debug mode or EXPOSE_FRAGMENT_CACHE_STATS=1)
+
+bp.cli.add_command(templates.compile_templates_command)
 
 
 # =============================================================================
@@ -56,6 +351,7 @@ class Product(db.Model):
     price = db.Column(db.Float, nullable=False)
     stock = db.Column(db.Integer, default=0)
     description = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Row version for {% cache %}
 
     def __repr__(self):
         return f'<Product {self.name}>'
@@ -65,12 +361,13 @@ class Product(db.Model):
 # ROUTES
 # =============================================================================
 
-@app.route('/')
+@bp.route('/')
 def index():
-    products = Product.query.all()
+    products, next_after = product_page(request.args.get('after', type=int))
     # Show which database is being used
     db_type = 'Unknown'
-    db_url = DATABASE_URL.lower()
+    database_url = current_app.config['SQLALCHEMY_DATABASE_URI']
+    db_url = database_url.lower()
     if 'postgresql' in db_url or 'postgres' in db_url:
         db_type = 'PostgreSQL'
     elif 'mysql' in db_url:
@@ -78,10 +375,54 @@ def index():
     elif 'sqlite' in db_url:
         db_type = 'SQLite'
 
-    return render_template('index.html', products=products, db_type=db_type, db_url=DATABASE_URL)
+    return render_template('index.html', products=products, next_after=next_after, db_type=db_type,
+                           db_url=database_url)
 
 
-@app.route('/add', methods=['GET', 'POST'])
+# One page at a time: rendering every product gets slower (and heavier) with
+# every row added. The page shows PAGE_SIZE products and a "Load more" link
+# that remembers the last id shown (keyset pagination):
+#     ... WHERE product.id > 50 ORDER BY product.id LIMIT 51
+# walks the primary key from there, so page 1000 is as fast as page 1 on
+# SQLite, PostgreSQL and MySQL alike (OFFSET would read every skipped row).
+#
+# GET /?after=<id>               - The whole page, starting after that product (works without JavaScript)
+# GET /products/rows?after=<id>  - Only the next rows (<tr>s): the script in index.html
+#                                  appends them when "Load more" is clicked or scrolled into view
+
+# The rows are read-only, so the page selects just the columns it shows into
+# slotted records instead of loading Product objects (see dbtools/serializers.py).
+# The template reads them the same way: product.name, product.price.
+product_serializer = Serializer(
+    'Product',
+    id=Product.id,
+    name=Product.name,
+    price=Product.price,
+    stock=Product.stock,
+    description=Product.description,
+    updated_at=Product.updated_at,  # Row version, for the fragment cache key
+)
+
+
+def product_page(after=None):
+    """PAGE_SIZE products in id order, after id `after`; returns (products, `after` for the next page)"""
+    size = current_app.config['PAGE_SIZE']
+    record_type = product_serializer.record_type()
+    query = select(*record_type.columns).order_by(Product.id)
+    if after is not None:
+        query = query.filter(Product.id > after)
+    rows = db.session.execute(query.limit(size + 1)).all()  # One extra row tells us if there is another page
+    next_after = rows[size - 1].id if len(rows) > size else None
+    return [record_type.record(row) for row in rows[:size]], next_after
+
+
+@bp.route('/products/rows')
+def product_rows():
+    products, next_after = product_page(request.args.get('after', type=int))
+    return render_template('product_rows.html', products=products, next_after=next_after)
+
+
+@bp.route('/add', methods=['GET', 'POST'])
 def add_product():
     if request.method == 'POST':
         new_product = Product(
@@ -93,18 +434,97 @@ def add_product():
         db.session.add(new_product)
         db.session.commit()
         flash('Product added!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     return render_template('add.html')
 
 
-@app.route('/delete/<int:id>')
+@bp.route('/delete/<int:id>')
 def delete_product(id):
     product = Product.query.get_or_404(id)
     db.session.delete(product)
     db.session.commit()
     flash('Product deleted!', 'danger')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
+
+
+# =============================================================================
+# BULK LOADER (flask load / flask seed)
+# =============================================================================
+# Creating one ORM object per row is slow and keeps every object in memory.
+# dbtools/bulk_load.py streams the rows in batches instead (COPY on PostgreSQL,
+# executemany elsewhere), all in one transaction.
+#
+#   flask --app app load products.csv --batch-size 5000
+#   flask --app app seed --rows 100000
+
+LOADABLE_MODELS = {'product': Product}
+
+
+@bp.cli.command('load')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--model', type=click.Choice(list(LOADABLE_MODELS)), default='product', show_default=True)
+@click.option('--batch-size', default=5000, show_default=True, help='Rows sent per executemany/COPY')
+def load_command(path, model, batch_size):
+    """Bulk-load rows from a CSV or NDJSON file"""
+    table = LOADABLE_MODELS[model].__table__
+    upgrade_db()
+    bulk_load.load_and_report(db.engine, table, bulk_load.read_rows(path), batch_size)
+
+
+@bp.cli.command('seed')
+@click.option('--rows', default=10000, show_default=True)
+@click.option('--batch-size', default=5000, show_default=True)
+def seed_command(rows, batch_size):
+    """Insert generated sample products (for trying things at scale)"""
+    upgrade_db()
+    products = ({'name': f'Product {i}', 'price': round(1 + i % 1000 * 0.99, 2), 'stock': i % 100} for i in range(rows))
+    bulk_load.load_and_report(db.engine, Product.__table__, products, batch_size)
+
+
+# =============================================================================
+# MIGRATIONS (flask --app app db ...)
+# =============================================================================
+# db.create_all() only creates tables that are missing: a new column or index
+# on Product would never reach a database that already exists. Migrations
+# (Alembic, through Flask-Migrate) do: every schema change is a numbered
+# script in migrations/versions/, and the database remembers the last one it
+# ran (table alembic_version). Part-4 has examples of changing a big table
+# online (a batched backfill, CREATE INDEX CONCURRENTLY).
+#
+#   flask --app app db migrate -m "add category"   # Write the next script from your model changes
+#   flask --app app db upgrade                     # Run the scripts this database hasn't run yet
+#
+# Migrations run on the primary (DATABASE_URL) only: replicas are read-only
+# copies and get every change by replication.
+#
+# init-db runs `upgrade` for you. A database made by db.create_all() (before
+# there were migrations) is first marked as being at BASELINE_REVISION.
+#
+# Alembic is only imported when a migration runs (or for `flask ...`
+# commands), so a server starting up doesn't pay for it.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+BASELINE_REVISION = '0001'  # The tables db.create_all() used to create
+
+
+def setup_migrations(app):
+    """Register Flask-Migrate on `app` (the `flask db ...` commands need it)"""
+    from flask_migrate import Migrate
+
+    if 'migrate' not in app.extensions:
+        Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)  # Batch mode: SQLite can't ALTER most things
+
+
+def upgrade_db():
+    """Run the migrations the primary hasn't run yet (needs an app context)"""
+    from flask_migrate import stamp, upgrade
+
+    setup_migrations(current_app)
+    tables = inspect(db.engine).get_table_names()
+    if tables and 'alembic_version' not in tables:  # Created by db.create_all()
+        stamp(revision=BASELINE_REVISION)
+    upgrade()
 
 
 # =============================================================================
@@ -112,24 +532,55 @@ def delete_product(id):
 # =============================================================================
 
 def init_db():
+    """Create tables and sample products on the primary (needs an app context)"""
+    upgrade_db()  # Create (or update) the tables, see MIGRATIONS above
+    click.echo(f"Database initialized! Using: {current_app.config['SQLALCHEMY_DATABASE_URI']}")
+
+    # bind=db.engine: on the primary. A plain SELECT would go to a replica, which may
+    # not exist yet or lag behind (then the samples would be added a second time).
+    count = db.session.execute(select(func.count()).select_from(Product), bind_arguments={'bind': db.engine})
+    if count.scalar() == 0:
+        sample = [
+            Product(name='Laptop', price=999.99, stock=10, description='High-performance laptop'),
+            Product(name='Mouse', price=29.99, stock=50, description='Wireless mouse'),
+            Product(name='Keyboard', price=79.99, stock=30, description='Mechanical keyboard'),
+        ]
+        db.session.add_all(sample)
+        db.session.commit()
+        click.echo('Sample products added!')
+
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the tables and sample products (run once before serving)"""
+    init_db()
+
+
+# =============================================================================
+# PRODUCTION SERVER (flask --app app serve)
+# =============================================================================
+# dbtools/serve.py runs the app under gunicorn: several worker processes, all
+# forked from this one. A forked worker inherits the parent's open database
+# connections, so reset_after_fork() drops them: two processes must never
+# share one.
+
+def reset_after_fork(app):
+    """Runs in every new worker process (gunicorn's post_fork hook)"""
     with app.app_context():
-        db.create_all()
-        print(f'Database initialized! Using: {DATABASE_URL}')
+        for engine in db.engines.values():
+            engine.dispose(close=False)  # Forget the parent's pooled connections (closing them would close the parent's)
+    metrics.reset()  # Numbers counted before the fork belong to the parent
+
 
-        if Product.query.count() == 0:
-            sample = [
-                Product(name='Laptop', price=999.99, stock=10, description='High-performance laptop'),
-                Product(name='Mouse', price=29.99, stock=50, description='Wireless mouse'),
-                Product(name='Keyboard', price=79.99, stock=30, description='Mechanical keyboard'),
-            ]
-            db.session.add_all(sample)
-            db.session.commit()
-            print('Sample products added!')
+bp.cli.add_command(serve.make_command(reset_after_fork, prepare=templates.compile_templates))  # Templates are compiled once, before forking
 
 
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=os.getenv('FLASK_DEBUG', 'True') == 'True')
+    debug = os.getenv('FLASK_DEBUG', 'True') == 'True'
+    app = create_app({'DEBUG': debug})  # Debug mode also serves /debug/queries, /metrics
+    with app.app_context():
+        init_db()
+    app.run()
 
 
 # =============================================================================
@@ -191,7 +642,7 @@ if __name__ == '__main__':
 #     DATABASE_URL=postgresql://...
 #     SECRET_KEY=your-secret-key
 #
-#   Then load with python-dotenv (already done in this file)
+#   Then load with python-dotenv (create_app() does this)
 #
 # =============================================================================
 
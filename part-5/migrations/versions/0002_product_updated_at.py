@@ -0,0 +1,30 @@
+"""add product.updated_at (row version)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:31:05.284160
+
+The templates put updated_at into their {% cache %} keys. Adding a nullable
+column is instant (no table rewrite) and nothing is backfilled: NULL is a
+version too, and the next write to a row sets it.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -10,15 +10,25 @@ How to Run:
 4. Open browser: http://localhost:5000
 """
 
+import os
+import sys
+
 from flask import Flask, render_template, request, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for dbtools/
+from dbtools import sqlite  # noqa: E402
+
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///inventory.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLITE_PRAGMAS'] = dict(sqlite.PRAGMAS)  # WAL, bigger cache, mmap: see dbtools/sqlite.py ({} = SQLite defaults)
 
 db = SQLAlchemy(app)
 
+with app.app_context():
+    sqlite.tune_engine(db.engine, app.config)
+
 
 # =============================================================================
 # STEP 1: Product Model (Already done for you)